@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+import main
+
+# The configs update_client protects, for the config benchmarks
+protected = main.protected_configs["client"]
+
+# Roughly the shape of a GTNH pack, see make_pack
+pack_shape = {
+    "configs": 3000,
+    "jars": 300,
+    "resources": 1500,
+    "scripts": 200,
+    "shaders_size": 32 * 1024 * 1024,
+}
+# Every run of the update benchmarks is appended here, to compare against previous runs
+results_file = os.path.abspath(main.updater_saves_dir + "benchmarks.jsonl")
+
+
+def make_config_tree(root, folders=300, files_per_folder=20):
+    """Create a GTNH-shaped "config" folder, with the protected configs spread around."""
+    for i in range(folders):
+        # Mods with nested folders, e.g. "config/GregTech/overpowered/..."
+        folder = os.path.join(root, "config", "mod" + str(i), "sub" + str(i % 7))
+        os.makedirs(folder)
+        for j in range(files_per_folder):
+            with open(os.path.join(folder, "option" + str(j) + ".cfg"), "w") as f:
+                f.write("S:value=" + str(j) + "\n")
+
+    for path in [
+        "config/GregTech/GregTech.cfg",
+        "config/NEI/client.cfg",
+        "config/NEI/server.cfg",
+        "config/betterquesting.cfg",
+        "config/InvTweaks.cfg",
+        "config/InGameInfoXML.cfg",
+    ]:
+        path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write("protected\n")
+
+
+def legacy_remove_configs(protected):
+    """remove_configs before the compiled matcher, to compare against."""
+    for root, dirs, files in os.walk("./config/"):
+        for dirname in dirs[:]:
+            dir_path = os.path.join(root, dirname)
+            if any(
+                os.path.normpath(dir_path).endswith(os.path.normpath(p))
+                for p in protected
+            ):
+                dirs.remove(dirname)
+        for filename in files:
+            file_path = os.path.join(root, filename)
+            if any(
+                os.path.normpath(file_path).endswith(os.path.normpath(p))
+                for p in protected
+            ):
+                continue
+            os.remove(file_path)
+
+
+def list_files(root):
+    """List every file below a folder, relative to it."""
+    files = set()
+    for folder, dirs, names in os.walk(root):
+        for name in names:
+            files.add(os.path.relpath(os.path.join(folder, name), root))
+    return files
+
+
+def time_remove_configs(remove_configs, repeat=3):
+    """Time a remove_configs implementation on a fresh tree, returns the best time."""
+    best = None
+    remaining = None
+    script_dir = os.getcwd()
+    for _ in range(repeat):
+        root = tempfile.mkdtemp()
+        try:
+            make_config_tree(root)
+            os.chdir(root)
+            start = time.perf_counter()
+            remove_configs(protected)
+            elapsed = time.perf_counter() - start
+            remaining = list_files(root)
+        finally:
+            os.chdir(script_dir)
+            shutil.rmtree(root)
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, remaining
+
+
+def time_matching(repeat=3):
+    """Time only the protected check over every path of a tree, without deleting."""
+    root = tempfile.mkdtemp()
+    try:
+        make_config_tree(root)
+        paths = [
+            os.path.join(".", os.path.relpath(path, root))
+            for path in sorted(list_files(root))
+        ]
+    finally:
+        shutil.rmtree(root)
+
+    def legacy():
+        return [
+            any(os.path.normpath(path).endswith(os.path.normpath(p)) for p in protected)
+            for path in paths
+        ]
+
+    def compiled():
+        is_protected = main.compile_protected(protected)
+        return [
+            is_protected(tuple(os.path.normpath(path).split(os.path.sep)))
+            for path in paths
+        ]
+
+    results = {}
+    for name, function in [("legacy", legacy), ("compiled", compiled)]:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            matches = function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = (best, matches)
+
+    return len(paths), results
+
+
+def bench_remove_configs():
+    """Compare remove_configs with the implementation it replaced."""
+    print("remove_configs:")
+    legacy_time, legacy_remaining = time_remove_configs(legacy_remove_configs)
+    new_time, new_remaining = time_remove_configs(main.remove_configs)
+    if legacy_remaining != new_remaining:
+        print("ERROR: The implementations kept different files.")
+        exit(1)
+    print("   -> Legacy:   %.3f s" % legacy_time)
+    print("   -> Compiled: %.3f s (%.1fx)" % (new_time, legacy_time / new_time))
+
+    count, results = time_matching()
+    if results["legacy"][1] != results["compiled"][1]:
+        print("ERROR: The matchers protect different files.")
+        exit(1)
+    print("Protected check only, " + str(count) + " paths:")
+    print("   -> Legacy:   %.4f s" % results["legacy"][0])
+    print(
+        "   -> Compiled: %.4f s (%.1fx)"
+        % (results["compiled"][0], results["legacy"][0] / results["compiled"][0])
+    )
+
+
+def make_jar(rng, size):
+    """Jar-like data, half compressible class files and half already compressed assets."""
+    text = ("public class Mod" + str(size) + " { }\n").encode() * (size // 64 + 1)
+    return text[: size // 2] + rng.randbytes(size - size // 2)
+
+
+def make_pack(zip_path, version, shape=pack_shape):
+    """Create a synthetic GTNH-shaped pack.
+
+    Version 2 of the pack renames 10% of the jars and changes 10% of the configs,
+    like a usual update. Some of the jars are client-side mods.
+    """
+    rng = random.Random(version)
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i in range(shape["configs"]):
+            # Most mods have nested config folders
+            name = "config/mod%d/sub%d/option%d.cfg" % (i // 20, i % 7, i)
+            value = version if i % 10 == 0 else 1
+            zf.writestr(name, "S:value=%d\n" % value * 20)
+        for path in [
+            "config/GregTech/GregTech.cfg",
+            "config/NEI/client.cfg",
+            "config/betterquesting.cfg",
+            "config/InvTweaks.cfg",
+        ]:
+            zf.writestr(path, "default\n")
+
+        client_side_mods = main.client_side_mods
+        for i in range(shape["jars"]):
+            jar_version = version if i % 10 == 0 else 1
+            if i < len(client_side_mods):
+                name = "mods/%s-%d.jar" % (client_side_mods[i], jar_version)
+            else:
+                name = "mods/mod%d-%d.jar" % (i, jar_version)
+            # Most jars are small, a few are large
+            size = rng.choice([16, 32, 64, 128, 256, 512, 2048]) * 1024
+            zf.writestr(name, make_jar(rng, size))
+
+        for i in range(shape["resources"]):
+            name = "resources/mod%d/textures/blocks/block%d.png" % (i // 50, i)
+            zf.writestr(name, rng.randbytes(2048))
+        for i in range(shape["scripts"]):
+            zf.writestr("scripts/script%d.zs" % i, "recipes.remove(<x:%d>);\n" % i * 50)
+        zf.writestr(
+            "resourcepacks/pack%d.zip" % version, rng.randbytes(4 * 1024 * 1024)
+        )
+        zf.writestr("README.md", "GT: New Horizons %d\n" % version)
+        zf.writestr("changelog from 1 to %d.md" % version, "Changes\n")
+
+
+def make_files_dir(root, shape=pack_shape):
+    """Create the "files" folder of the script, with additional mods and shaders."""
+    rng = random.Random(0)
+    for side in ["client", "server"]:
+        folder = os.path.join(root, "files", "additional-mods-" + side)
+        os.makedirs(folder)
+        for i in range(3):
+            with open(os.path.join(folder, "Additional%d.jar" % i), "wb") as f:
+                f.write(make_jar(rng, 256 * 1024))
+
+    folder = os.path.join(root, "files", "shaders")
+    os.makedirs(folder)
+    with open(os.path.join(folder, "OptiFine_1.7.10_HD_U_E7.jar"), "wb") as f:
+        f.write(make_jar(rng, 2 * 1024 * 1024))
+    with open(os.path.join(folder, "Shaders.zip"), "wb") as f:
+        f.write(rng.randbytes(shape["shaders_size"]))
+    with open(os.path.join(folder, "optionsshaders.txt"), "w") as f:
+        f.write("shaderPack=Shaders.zip\n")
+
+
+def make_instance(path, old_pack, with_manifest):
+    """Create an existing instance, updated with the old pack, with saves & options."""
+    os.makedirs(path)
+    with zipfile.ZipFile(old_pack) as zf:
+        zf.extractall(path)
+    for i in range(20):
+        folder = os.path.join(path, "saves", "World", "region")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, "r.%d.0.mca" % i), "wb") as f:
+            f.write(b"\0" * 64 * 1024)
+    with open(os.path.join(path, "options.txt"), "w") as f:
+        f.write("fov:0.0\n")
+
+    if with_manifest:
+        script_dir = os.getcwd()
+        os.chdir(path)
+        try:
+            main.save_manifest(main.read_zip_index(os.path.join(script_dir, old_pack)))
+        finally:
+            os.chdir(script_dir)
+
+
+def time_phase(phases, name, function, *args):
+    """Time a phase of the update, without its output."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function(*args)
+    phases[name] = phases.get(name, 0) + time.perf_counter() - start
+    return result
+
+
+def run_update(side, path, pack):
+    """Run the phases of update_client/update_server, returns the time of each phase.
+
+    The pack is installed by install_game_zip, its phases are the ones it times itself.
+    Java 9+ is skipped, it only downloads and moves a few files.
+    """
+    phases = {}
+    script_dir = os.getcwd()
+    # Extracted from where it is, like get_zip_file
+    zip_file = os.path.abspath(pack)
+    additional_mods_dir = main.updater_files_dir + "additional-mods-" + side
+    shaders_dir = main.updater_files_dir + "shaders"
+
+    main.arg = side
+    main.progress_bar = 0
+    main.auto_update_on_game_launch = False
+    main.keep_zip_file = True
+    try:
+        copied_dirs = [additional_mods_dir]
+        if side == "client":
+            copied_dirs.append(shaders_dir)
+        time_phase(
+            phases, "preflight", main.preflight, side, path, zip_file, copied_dirs
+        )
+        time_phase(
+            phases,
+            "copy additional mods",
+            main.copy_dir_to_game,
+            additional_mods_dir,
+            path,
+        )
+        if side == "client":
+            time_phase(phases, "copy shaders", main.copy_dir_to_game, shaders_dir, path)
+
+        os.chdir(path)
+        main.phase_timings = []
+        time_phase(
+            phases,
+            "index & manifest",
+            main.install_game_zip,
+            zip_file,
+            main.protected_configs[side],
+            main.update_folders[side],
+            main.compile_profile(side),
+        )
+        # Split into the phases install_game_zip timed, the rest is the index & manifest
+        for name, total in main.summarize_timings().items():
+            phases[name] = total["seconds"]
+            phases["index & manifest"] -= total["seconds"]
+
+        time_phase(
+            phases,
+            "add additional mods",
+            main.add_dir_to_game,
+            additional_mods_dir,
+            "./mods/",
+        )
+        if side == "client":
+            time_phase(phases, "add shaders", main.add_shaders_to_game, shaders_dir)
+        time_phase(phases, "trash cleanup", main.empty_trash)
+    finally:
+        os.chdir(script_dir)
+
+    return phases
+
+
+def record_results(name, phases):
+    """Append the results to results_file, returns the previous results of the benchmark."""
+    previous = None
+    if os.path.isfile(results_file):
+        with open(results_file, "r") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                if result.get("benchmark") == name:
+                    previous = result
+
+    os.makedirs(os.path.dirname(results_file), exist_ok=True)
+    with open(results_file, "a") as f:
+        result = {
+            "benchmark": name,
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "system": platform.system(),
+            "cpus": os.cpu_count(),
+            "extract_workers": main.extract_workers,
+            "shape": pack_shape,
+            "phases": phases,
+            "total": sum(phases.values()),
+        }
+        f.write(json.dumps(result) + "\n")
+
+    return previous
+
+
+def print_phases(phases, previous):
+    """Print the time of each phase, compared to the previous run."""
+    previous_phases = previous["phases"] if previous else {}
+    for name, elapsed in list(phases.items()) + [("total", sum(phases.values()))]:
+        line = "   -> %-22s %7.3f s" % (name + ":", elapsed)
+        before = previous["total"] if name == "total" and previous else None
+        before = previous_phases.get(name, before)
+        if before:
+            line += " (%+.0f%% vs previous run)" % ((elapsed / before - 1) * 100)
+        print(line)
+
+
+def bench_update(side):
+    """Update a synthetic instance, once as a full reinstall & once as a delta."""
+    root = tempfile.mkdtemp()
+    script_dir = os.getcwd()
+    store_dir = main.store_dir
+    pack_index_dir = main.pack_index_dir
+    try:
+        os.chdir(root)
+        # Don't share the synthetic jars with the real instances
+        main.store_dir = os.path.join(root, "files", "store")
+        main.store_supported = {}
+        main.pack_index_dir = os.path.join(root, "files", "saves", "packs")
+        main.pack_indexes = {}
+
+        print(side.capitalize() + " update, generating the synthetic pack...")
+        make_files_dir(".")
+        make_pack("old.zip", 1)
+        make_pack("GT_New_Horizons_2_" + side + ".zip", 2)
+        pack = os.path.abspath("GT_New_Horizons_2_" + side + ".zip")
+
+        for mode in ["full", "delta"]:
+            path = os.path.abspath(mode)
+            make_instance(path, "old.zip", mode == "delta")
+            # Additional mods & shaders are moved out of the game folder, put them back
+            if os.path.isdir("files-backup"):
+                shutil.rmtree("files/")
+                shutil.copytree("files-backup", "files")
+            else:
+                shutil.copytree("files", "files-backup")
+
+            phases = run_update(side, path, pack)
+            name = "update_" + side + "_" + mode
+            previous = record_results(name, phases)
+            print(side.capitalize() + " update, " + mode + ":")
+            print_phases(phases, previous)
+    finally:
+        os.chdir(script_dir)
+        main.store_dir = store_dir
+        main.store_supported = {}
+        main.pack_index_dir = pack_index_dir
+        main.pack_indexes = {}
+        shutil.rmtree(root)
+
+
+benchmarks = {
+    "remove_configs": bench_remove_configs,
+    "update_client": lambda: bench_update("client"),
+    "update_server": lambda: bench_update("server"),
+}
+
+
+def run():
+    # Run everything, or the benchmarks given as arguments
+    names = sys.argv[1:] or list(benchmarks)
+    for name in names:
+        if name not in benchmarks:
+            print(
+                "ERROR: Unknown benchmark '" + name + "'. Use:", ", ".join(benchmarks)
+            )
+            exit()
+        benchmarks[name]()
+        print()
+
+
+if __name__ == "__main__":
+    run()
@@ -1,11 +1,31 @@
 #!/usr/bin/env python3
 
+import concurrent.futures
+import contextlib
+import cProfile
+import fnmatch
+import hashlib
+import http.client
+import json
 import os
+import re
 import shutil
+import struct
 import sys
+import threading
 import time
+import tracemalloc
+import traceback
+import urllib.error
 import urllib.request
 import zipfile
+import zlib
+
+# Only available on Unix, used for reflinks
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # Modules that are not built-in to Python.
 try:
@@ -25,8 +45,148 @@ java_9_answer = ""
 max_progress = "5"
 progress_bar = 0
 auto_update_on_game_launch = False
+# Zlib releases the GIL while inflating, so threads extract in parallel
+extract_workers = min(8, os.cpu_count() or 1)
+download_chunk_size = 1024 * 1024
+download_timeout = 30
+download_retries = 5
+# Extract the pack while it is being downloaded, see pipeline_download_zip
+pipeline_download = False
+pipeline_staging_dir = ""
+# The zip is shared, e.g. by every server in a batch, don't remove it after extracting
+keep_zip_file = False
+# Build the update next to the server, and swap it in later with "python main.py swap"
+staged_update = False
 updater_files_dir = "./files/"
 updater_saves_dir = updater_files_dir + "saves/"
+# See: https://gtnh.miraheze.org/wiki/Client-side_Mods
+client_side_mods = [
+    "BeeBetterAtBees",
+    "BetterAchievements",
+    "Controlling",
+    "CustomMainMenu",
+    "DefaultWorldGenerator",
+    "IC2+Crop+Plugin",
+    "InGameInfoXML",
+    "MouseTweaks",
+    "NettyPatch",
+    "OptiFine",
+    "ResourceLoader",
+    "bettercrashes",
+    "betterloadingscreen",
+    "boubs-admin-tools",
+    "craftpresence",
+    "defaultserverlist",
+    "fastcraft",
+    "inventorytweaks",
+    "itlt",
+    "journeymap-",
+    "oauth",
+    "overloadedarmorbar",
+    "torohealth",
+]
+
+# What each side extracts from the zip, applied to the central directory before anything is inflated.
+# "include" & "exclude" are globs of member names, "exclude_mods" are case-insensitive
+# prefixes of jars in "mods/". Use another profile with e.g. "--extract=test".
+extraction_profiles = {
+    "client": {
+        "include": ["*"],
+        "exclude": [],
+        "exclude_mods": [],
+    },
+    "server": {
+        "include": ["*"],
+        "exclude": ["resourcepacks/*", "README.md"],
+        "exclude_mods": client_side_mods,
+    },
+    # Headless server used for testing the pack, e.g. if it boots
+    "test": {
+        "include": ["config/*", "mods/*", "scripts/*"],
+        "exclude": [],
+        "exclude_mods": client_side_mods,
+    },
+}
+extraction_profile = ""
+# Replaced by an update of each side.
+# NOTE: Don't include "config", it is handled by remove_configs
+update_folders = {
+    "client": ["mods", "resourcepacks", "resources", "scripts", "README.md"],
+    "server": ["mods", "resourcepacks", "resources", "scripts"],
+}
+# Configs that are never replaced, in "config"
+protected_configs = {
+    "client": [
+        "GregTech/GregTech.cfg",
+        "NEI/",
+        "betterquesting.cfg",
+        "InvTweaks.cfg",
+        "InGameInfoXML.cfg",
+    ],
+    "server": [
+        "GregTech/GregTech.cfg",
+        "aroma1997/",
+        "JourneyMapServer/",
+        "Morpheus.cfg",
+    ],
+}
+# Used by "plan" to estimate the duration, unless "timings_file" has measured ones
+plan_extract_rate = 50 * 1024 * 1024
+plan_delete_rate = 5000
+# Free space to keep on top of what the update writes, skip the check with "--skip-preflight"
+preflight_margin = 64 * 1024 * 1024
+skip_preflight = False
+# Relative to the game directory, used after we have moved into it
+instance_saves_dir = "./.gtnh-updater/"
+manifest_file = instance_saves_dir + "manifest.json"
+installed_file = instance_saves_dir + "installed.json"
+# What was added on top of the pack, e.g. lwjgl3ify, see add_java_9_to_game
+artifacts_file = instance_saves_dir + "artifacts.json"
+config_conflicts_file = instance_saves_dir + "config-conflicts.txt"
+# What an update reads & rewrites, copied into staging instead of hardlinked
+instance_state_files = [
+    manifest_file,
+    installed_file,
+    artifacts_file,
+    config_conflicts_file,
+]
+# Old trees are renamed into it, and deleted in the background while extracting
+trash_dir = instance_saves_dir + "trash"
+trash_path = ""
+trash_executor = None
+trash_futures = []
+# Jars & zips shared by every instance, keyed by SHA-256. Absolute, as we move around
+store_dir = os.path.abspath(updater_files_dir + "store")
+store_extensions = (".jar", ".zip")
+# Device -> can hardlink from the store, see check_store
+store_supported = {}
+# Downloads of lwjgl3ify as "<version>/<file>", shared by every instance & Java version.
+# The "java_9_cache_keep" most recently used versions are kept
+java_9_cache_dir = os.path.abspath(updater_saves_dir + "lwjgl3ify")
+java_9_cache_keep = 3
+# Responses from GitHub, reused for "github_cache_ttl" seconds.
+# The TTL can be changed by writing the number of seconds to "github-cache-ttl.txt"
+github_cache_file = os.path.abspath(updater_saves_dir + "github-cache.json")
+github_cache_ttl_file = os.path.abspath(updater_saves_dir + "github-cache-ttl.txt")
+github_cache_ttl = 3600
+github_raw_url = "https://raw.githubusercontent.com/flyslime/gtnh-updater/main/"
+github_commit_url = "https://api.github.com/repos/flyslime/gtnh-updater/commits/main"
+script_commit_file = os.path.abspath(updater_saves_dir + "script-commit.txt")
+# The central directory of each pack, parsed once, see load_pack_index.
+# "packs.json" maps "<size>-<mtime>" of a zip to its index, named by the hash of its central directory
+pack_index_dir = os.path.abspath(updater_saves_dir + "packs")
+pack_index_keep = 5
+pack_indexes = {}
+# Wall time, bytes & files of each phase of the update, see timed_phase.
+# Printed as each phase ends with "--timings", appended to "timings_file" with "--report"
+phase_timings = []
+current_phases = []
+show_timings = False
+timings_file = ""
+# Run under cProfile & tracemalloc with "--profile", see profile_main
+profile_updates = False
+profile_dir = os.path.abspath(updater_saves_dir + "profiles")
+phase_allocations = []
 
 
 def total_progress():
@@ -36,6 +196,149 @@ def total_progress():
     return "[" + str(progress_bar) + "/" + max_progress + "]"
 
 
+@contextlib.contextmanager
+def timed_phase(name):
+    """Record the wall time of a phase, the bytes & files are added with count_phase."""
+    timing = {"phase": name, "seconds": 0.0, "bytes": 0, "files": 0}
+    current_phases.append(timing)
+    if profile_updates:
+        tracemalloc.reset_peak()
+        snapshot = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing["seconds"] = time.perf_counter() - start
+        current_phases.remove(timing)
+        phase_timings.append(timing)
+        if profile_updates:
+            record_allocations(name, snapshot)
+        if show_timings:
+            print_timing(timing)
+
+
+def record_allocations(name, before):
+    """Record the peak memory of a phase, and the snapshots before & after it.
+
+    The snapshots are only compared in write_allocations, once the profiler is off.
+    """
+    peak = tracemalloc.get_traced_memory()[1]
+    phase_allocations.append((name, peak, before, tracemalloc.take_snapshot()))
+
+
+def write_allocations(report_file, top=10):
+    """Write the lines that allocated the most during each phase, and the overall peak."""
+    mb = 1024 * 1024
+    # Without the allocations of tracemalloc itself
+    filters = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    with open(report_file, "w") as f:
+        f.write("Peak: %.1f MB\n" % (tracemalloc.get_traced_memory()[1] / mb))
+        for name, peak, before, after in phase_allocations:
+            f.write("\n%s (peak %.1f MB):\n" % (name, peak / mb))
+            stats = after.filter_traces(filters).compare_to(
+                before.filter_traces(filters), "lineno"
+            )
+            for stat in stats[:top]:
+                f.write("   " + str(stat) + "\n")
+
+
+def profile_main():
+    """Run main() under cProfile & tracemalloc, used with "--profile".
+
+    Writes "<command>-<date>.prof", for pstats or e.g. snakeviz, and the top
+    allocations of each phase to "<command>-<date>-allocations.txt" in profile_dir.
+    Only this process is profiled, not the processes of "batch".
+    """
+    global profile_updates
+    profile_updates = True
+    name = sys.argv[1] + "-" + time.strftime("%Y%m%d-%H%M%S")
+    profile_file = os.path.join(profile_dir, name + ".prof")
+    allocations_file = os.path.join(profile_dir, name + "-allocations.txt")
+
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        main()
+    finally:
+        profiler.disable()
+        os.makedirs(profile_dir, exist_ok=True)
+        profiler.dump_stats(profile_file)
+        write_allocations(allocations_file)
+        tracemalloc.stop()
+        print()
+        print("NOTE: Profile saved to", profile_file)
+        print("NOTE: Allocations saved to", allocations_file)
+
+
+def count_phase(files=0, bytes=0):
+    """Add to the files & bytes processed by the current phase, if any.
+
+    Background threads, e.g. the Java 9+ prefetch, aren't part of any phase.
+    """
+    if current_phases and threading.current_thread() is threading.main_thread():
+        current_phases[-1]["files"] += files
+        current_phases[-1]["bytes"] += bytes
+
+
+def print_timing(timing):
+    """Print the time, files & throughput of a phase."""
+    mb = 1024 * 1024
+    line = "   -> %s: %.2f s" % (timing["phase"], timing["seconds"])
+    if timing["files"]:
+        line += ", %d files" % timing["files"]
+    if timing["bytes"]:
+        line += ", %.1f MB" % (timing["bytes"] / mb)
+        if timing["seconds"] > 0:
+            line += " (%.1f MB/s)" % (timing["bytes"] / mb / timing["seconds"])
+    print(line)
+
+
+def summarize_timings():
+    """Sum the timings of each phase, phases can run more than once."""
+    summary = {}
+    for timing in phase_timings:
+        total = summary.setdefault(
+            timing["phase"], {"seconds": 0.0, "bytes": 0, "files": 0}
+        )
+        for key in total:
+            total[key] += timing[key]
+    return summary
+
+
+def print_timings():
+    """Print the total of each phase, slowest first."""
+    summary = summarize_timings()
+    print("Timings:")
+    for name, total in sorted(
+        summary.items(), key=lambda item: item[1]["seconds"], reverse=True
+    ):
+        print_timing(dict(total, phase=name))
+    print("   -> total: %.2f s" % sum(total["seconds"] for total in summary.values()))
+
+
+def write_timings(path):
+    """Append the timings of the update as a JSON line to timings_file, if set."""
+    if not timings_file:
+        return
+
+    report = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "command": arg,
+        "version": gtnh_version,
+        "path": os.path.abspath(path),
+        "cpus": os.cpu_count(),
+        "extract_workers": extract_workers,
+        "phases": phase_timings,
+        "summary": summarize_timings(),
+        "total_seconds": sum(timing["seconds"] for timing in phase_timings),
+    }
+    os.makedirs(os.path.dirname(timings_file), exist_ok=True)
+    # A single write, servers of a batch append to the same file
+    with open(timings_file, "a") as f:
+        f.write(json.dumps(report) + "\n")
+
+
 def get_game_path(path_file, arg):
     """Acquire the path for GregTech client/server.
 
@@ -75,14 +378,425 @@ def get_game_path(path_file, arg):
     return path
 
 
-def get_zip_file(path_file, path):
+def download_part(url, part_file, quiet=False):
+    """Stream a URL into a ".part" file, resuming from what is already downloaded.
+
+    Returns the total size of the file, or None if the server didn't tell us.
+    """
+    offset = 0
+    if os.path.exists(part_file):
+        offset = os.path.getsize(part_file)
+
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", "bytes=" + str(offset) + "-")
+
+    try:
+        response = urllib.request.urlopen(request, timeout=download_timeout)
+    except urllib.error.HTTPError as e:
+        # The ".part" file is already complete
+        if e.code == 416 and offset:
+            return offset
+        raise
+
+    with response:
+        content_length = response.headers.get("Content-Length")
+        if response.status == 206:
+            mode = "ab"
+            content_range = response.headers.get("Content-Range", "")
+            if content_range.rpartition("/")[2].isdigit():
+                total_size = int(content_range.rpartition("/")[2])
+            elif content_length is not None:
+                total_size = offset + int(content_length)
+            else:
+                total_size = None
+        else:
+            # The server ignored the range, start over
+            offset = 0
+            mode = "wb"
+            total_size = int(content_length) if content_length is not None else None
+
+        downloaded = offset
+        start_time = time.monotonic()
+        last_report = start_time
+        with open(part_file, mode) as f:
+            while True:
+                chunk = response.read(download_chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+                downloaded += len(chunk)
+
+                now = time.monotonic()
+                if not quiet and now - last_report >= 0.5:
+                    last_report = now
+                    print_throughput(
+                        downloaded, total_size, downloaded - offset, now - start_time
+                    )
+
+        if not quiet:
+            print_throughput(
+                downloaded,
+                total_size,
+                downloaded - offset,
+                time.monotonic() - start_time,
+            )
+            print()
+
+    count_phase(bytes=downloaded - offset)
+    if total_size is not None and downloaded < total_size:
+        raise http.client.IncompleteRead(b"", total_size - downloaded)
+
+    return total_size if total_size is not None else downloaded
+
+
+def print_throughput(downloaded, total_size, session_bytes, elapsed):
+    """Print the download progress and speed on a single line."""
+    mb = 1024 * 1024
+    speed = session_bytes / mb / elapsed if elapsed > 0 else 0
+    progress = "%.1f" % (downloaded / mb)
+    if total_size:
+        progress += "/%.1f" % (total_size / mb)
+    print(
+        "   -> " + progress + " MB (%.1f MB/s)" % speed + " " * 8, end="\r", flush=True
+    )
+
+
+def verify_download(file, total_size=None, sha256=None, validate_zip=False):
+    """Verify a downloaded file, raises ValueError if something doesn't match."""
+    if total_size is not None and os.path.getsize(file) != total_size:
+        raise ValueError(
+            "expected " + str(total_size) + " bytes, got " + str(os.path.getsize(file))
+        )
+
+    if sha256 and file_sha256(file).casefold() != sha256.casefold():
+        raise ValueError("SHA-256 mismatch")
+
+    # The CRC of every member is checked while extracting
+    if validate_zip:
+        try:
+            with zipfile.ZipFile(file) as zf:
+                zf.infolist()
+        except zipfile.BadZipFile as e:
+            raise ValueError("not a valid zip file (" + str(e) + ")")
+
+
+def safe_member_path(name):
+    """Convert a zip member name into a relative path, raises ValueError if it escapes."""
+    parts = name.replace("\\", "/").split("/")
+    if name.startswith("/") or ".." in parts or ":" in parts[0]:
+        raise ValueError("unsafe member name '" + name + "'")
+    return os.path.normpath(os.path.join(*parts)) if name.strip("/") else ""
+
+
+def stream_extract_members(read, unread, staging_dir):
+    """Parse the local headers of a zip stream and write the members to a folder.
+
+    "read(n)" returns up to n bytes of the stream, "unread(data)" puts bytes back.
+    Parsing stops at the central directory.
+    Returns a dictionary of "member name" -> [size, crc] of the extracted files.
+    """
+    members = {}
+    while True:
+        header = read(30)
+        if header[:4] != b"PK\x03\x04":
+            unread(header)
+            return members
+        if len(header) < 30:
+            raise ValueError("truncated local header")
+
+        (
+            flags,
+            method,
+            crc,
+            compress_size,
+            file_size,
+            name_length,
+            extra_length,
+        ) = struct.unpack("<6xHH4xLLLHH", header)
+        raw_name = read(name_length)
+        extra = read(extra_length)
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+
+        if flags & 0x1:
+            raise ValueError("encrypted member '" + name + "'")
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise ValueError("unsupported compression for '" + name + "'")
+
+        # Zip64 sizes are stored in an extra field
+        zip64 = False
+        offset = 0
+        while offset + 4 <= len(extra):
+            field_id, field_length = struct.unpack("<HH", extra[offset : offset + 4])
+            if field_id == 0x0001:
+                zip64 = True
+                values = extra[offset + 4 : offset + 4 + field_length]
+                if file_size == 0xFFFFFFFF:
+                    file_size, values = struct.unpack("<Q", values[:8])[0], values[8:]
+                if compress_size == 0xFFFFFFFF:
+                    compress_size = struct.unpack("<Q", values[:8])[0]
+            offset += 4 + field_length
+
+        has_descriptor = flags & 0x8
+        if has_descriptor and method == zipfile.ZIP_STORED:
+            raise ValueError("stored member '" + name + "' without size")
+
+        dst_path = safe_member_path(name)
+        dst_path = os.path.join(staging_dir, dst_path) if dst_path else staging_dir
+        if name.endswith("/"):
+            os.makedirs(dst_path, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+
+        decompressor = (
+            zlib.decompressobj(-15) if method == zipfile.ZIP_DEFLATED else None
+        )
+        written = 0
+        member_crc = 0
+        remaining = None if has_descriptor else compress_size
+        with open(os.devnull if name.endswith("/") else dst_path, "wb") as f:
+            while remaining is None or remaining > 0:
+                size = download_chunk_size
+                if remaining is not None:
+                    size = min(size, remaining)
+                data = read(size)
+                if not data:
+                    raise ValueError("truncated data for '" + name + "'")
+                if remaining is not None:
+                    remaining -= len(data)
+
+                if decompressor is not None:
+                    data_out = decompressor.decompress(data)
+                    if decompressor.eof:
+                        # Read too far, put back what belongs to the next header
+                        unread(decompressor.unused_data)
+                        remaining = 0
+                else:
+                    data_out = data
+
+                f.write(data_out)
+                written += len(data_out)
+                member_crc = zlib.crc32(data_out, member_crc)
+
+        if has_descriptor:
+            descriptor = read(4)
+            if descriptor != b"PK\x07\x08":
+                unread(descriptor)
+            descriptor = read(20 if zip64 else 12)
+            crc = struct.unpack("<L", descriptor[:4])[0]
+            file_size = written
+
+        if member_crc != crc or written != file_size:
+            raise ValueError("CRC or size mismatch for '" + name + "'")
+
+        if not name.endswith("/"):
+            members[name] = [file_size, crc]
+
+
+def pipeline_download_zip(url, zip_name, staging_dir, sha256=None):
+    """Download the zip and extract it into a staging folder at the same time.
+
+    The zip is still written to "<zip_name>.part", so if anything goes wrong the
+    regular download resumes from there. Once downloaded, the staged members
+    are validated against the central directory.
+    Returns True if the staging folder holds every member of the zip.
+    """
+    part_file = zip_name + ".part"
+    pending = bytearray()
+    remove(staging_dir)
+
+    try:
+        response = urllib.request.urlopen(url, timeout=download_timeout)
+    except (OSError, http.client.HTTPException) as e:
+        print(
+            "   -> Pipeline download failed (" + str(e) + "), downloading normally..."
+        )
+        return False
+
+    content_length = response.headers.get("Content-Length")
+    total_size = int(content_length) if content_length is not None else None
+    progress = {"downloaded": 0, "last_report": 0}
+    start_time = time.monotonic()
+
+    with response, open(part_file, "wb") as f:
+
+        def read(n):
+            # Everything that is downloaded goes to the ".part" file as well
+            while len(pending) < n:
+                chunk = response.read(download_chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+                pending.extend(chunk)
+
+                progress["downloaded"] += len(chunk)
+                now = time.monotonic()
+                if now - progress["last_report"] >= 0.5:
+                    progress["last_report"] = now
+                    print_throughput(
+                        progress["downloaded"],
+                        total_size,
+                        progress["downloaded"],
+                        now - start_time,
+                    )
+            data = bytes(pending[:n])
+            del pending[:n]
+            return data
+
+        def unread(data):
+            pending[:0] = data
+
+        members = None
+        try:
+            members = stream_extract_members(read, unread, staging_dir)
+        except ValueError as e:
+            print()
+            print(
+                "   -> Can't extract while downloading (" + str(e) + "), continuing..."
+            )
+        except (OSError, http.client.HTTPException) as e:
+            print()
+            print("   -> Download interrupted (" + str(e) + "), resuming...")
+            remove(staging_dir)
+            return False
+
+        # Download the rest, e.g. the central directory
+        try:
+            while read(download_chunk_size):
+                pending.clear()
+        except (OSError, http.client.HTTPException) as e:
+            print()
+            print("   -> Download interrupted (" + str(e) + "), resuming...")
+            remove(staging_dir)
+            return False
+
+        print_throughput(
+            progress["downloaded"],
+            total_size,
+            progress["downloaded"],
+            time.monotonic() - start_time,
+        )
+        print()
+        count_phase(bytes=progress["downloaded"])
+
+    if total_size is not None and progress["downloaded"] < total_size:
+        remove(staging_dir)
+        return False
+
+    try:
+        verify_download(part_file, total_size, sha256, validate_zip=True)
+    except ValueError:
+        remove(part_file)
+        remove(staging_dir)
+        raise
+    os.replace(part_file, zip_name)
+
+    # Validate the staged members against the central directory
+    if members is None or members != read_zip_index(zip_name):
+        print("   -> Extracted files don't match the zip, extracting normally...")
+        remove(staging_dir)
+        return False
+
+    return True
+
+
+def download_file(url, dst, sha256=None, validate_zip=False, quiet=False):
+    """Download a file in chunks, resumes and retries if the connection is lost.
+
+    The file is written to "<dst>.part" and only renamed to "dst" once verified,
+    so an interrupted download continues where it left off on the next run.
+    """
+    part_file = dst + ".part"
+    for attempt in range(download_retries + 1):
+        try:
+            total_size = download_part(url, part_file, quiet)
+            break
+        except (OSError, http.client.HTTPException) as e:
+            # Don't retry client errors, e.g. 404
+            if isinstance(e, urllib.error.HTTPError) and e.code < 500 and e.code != 429:
+                raise
+            if attempt == download_retries:
+                raise
+            delay = 2**attempt
+            print()
+            print(
+                "   -> Download interrupted (" + str(e) + "), retrying in",
+                delay,
+                "seconds...",
+            )
+            time.sleep(delay)
+
+    try:
+        verify_download(part_file, total_size, sha256, validate_zip)
+    except ValueError:
+        # Start from scratch next time
+        remove(part_file)
+        raise
+
+    os.replace(part_file, dst)
+
+
+def get_zip_name(url):
+    """Get the file name of the zip from its URL, e.g. ".../GT_New_Horizons_2.3.3_Client.zip?dl=1"."""
+    return url.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+
+
+def save_installed_record(record_file, zip_file, shader_answer):
+    """Remember what was installed, used to skip the update when launching the game."""
+    record = {
+        "zip": os.path.basename(zip_file),
+        "version": gtnh_version,
+        "java_9": java_9_answer,
+        "shaders": shader_answer,
+    }
+    # A new file, the record of a staged update must not change the live server's
+    write_json(record_file, record)
+
+
+def is_launch_current():
+    """Check if the client is already up-to-date, without touching the game.
+
+    Compares the installed record with the latest version on GitHub, which is only
+    a conditional request for one small file. Anything unknown -> Not up-to-date.
+    """
+    saved = {}
+    for name in ("gamepath", "autodownload", "java-version", "shaders"):
+        saved_file = updater_saves_dir + name + ".txt"
+        if not os.path.isfile(saved_file):
+            return False
+        with open(saved_file, "r") as f:
+            saved[name] = f.readline()
+
+    # The latest version is only known with "automatic" downloads
+    if saved["autodownload"] != "y":
+        return False
+
+    latest_version_file = updater_files_dir + "GTNH-java8-version.txt"
+    update_version_file(latest_version_file)
+    with open(latest_version_file, "r") as f:
+        zip_name = get_zip_name(f.readline().strip())
+
+    try:
+        with open(saved["gamepath"] + "/" + installed_file, "r") as f:
+            installed = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    return (
+        isinstance(installed, dict)
+        and installed.get("zip") == zip_name
+        and installed.get("java_9") == saved["java-version"]
+        and installed.get("shaders") == saved["shaders"]
+    )
+
+
+def find_zip_file(path):
     """Searches for zip file in current directory.
 
     User can decide if they want to use "automatic" download, checks text file for updated zip.
     Otherwise, use zip file in current directory.
 
     Check for odd inputs -> Stop the program and ask gives appropriate error message.
-    If zip file is found in current directory -> Copy it over to game directory
     """
     auto_download_file = updater_saves_dir + "autodownload.txt"
     auto_download_answer = "n"
@@ -105,37 +819,21 @@ def get_zip_file(path_file, path):
 
     # Uses the URL in "latestversion.txt" to download the "latest" version
     if auto_download_answer == "y":
-        # Pull latest version from GitHub
-        zip_name = "GTNH-Updater-latest.zip"
-        github_file_name = "GTNH-Updater-main"
-
-        urllib.request.urlretrieve(
-            "https://github.com/flyslime/gtnh-updater/archive/refs/heads/main.zip",
-            zip_name,
-        )
-
-        # Extract latest version
-        with zipfile.ZipFile(zip_name, "r") as zip_ref:
-            zip_ref.extractall(".")
-
         # Download Java 8 version, modify this version to get Java 9+
         latest_version_file = updater_files_dir + "GTNH-java8-version.txt"
 
-        # Ensure we are using the latest version from GitHub
-        remove(latest_version_file)
-        shutil.move(github_file_name + "/" + latest_version_file, latest_version_file)
-        remove(github_file_name)
+        # Ensure we are using the latest version from GitHub, only fetches this one file
+        update_version_file(latest_version_file)
 
-        # Acquire the URL
+        # Acquire the URL, and the SHA-256 of the zip if there is one
         latest_version_url = ""
         with open(latest_version_file, "r") as f:
-            latest_version_url = f.readline()
+            latest_version_url = f.readline().strip()
+            latest_version_sha256 = f.readline().strip()
 
         # Detects if update is needed, and removes previous zips
         new_update = True
-        zip_name = latest_version_url[
-            latest_version_url.rfind("/") + 1 : latest_version_url.rfind("?")
-        ]
+        zip_name = get_zip_name(latest_version_url)
         files_dir = os.listdir(".")
         for file in files_dir:
             if file.endswith(".zip"):
@@ -150,6 +848,9 @@ def get_zip_file(path_file, path):
                         time.sleep(1)
                     print()
                 remove(file)
+            # Partial download of an older version
+            elif file.endswith(".zip.part") and file != zip_name + ".part":
+                remove(file)
 
         # Download latest version
         if new_update:
@@ -163,10 +864,34 @@ def get_zip_file(path_file, path):
         )
         print()
 
-        urllib.request.urlretrieve(
-            latest_version_url,
-            zip_name,
-        )
+        try:
+            with timed_phase("download"):
+                # Extract while downloading, can't be used when resuming a download
+                if pipeline_download and not os.path.exists(zip_name + ".part"):
+                    global pipeline_staging_dir
+                    pipeline_staging_dir = os.path.abspath(
+                        path + "/" + instance_saves_dir + "staging"
+                    )
+                    if not pipeline_download_zip(
+                        latest_version_url,
+                        zip_name,
+                        pipeline_staging_dir,
+                        sha256=latest_version_sha256,
+                    ):
+                        pipeline_staging_dir = ""
+
+                if not os.path.exists(zip_name):
+                    download_file(
+                        latest_version_url,
+                        zip_name,
+                        sha256=latest_version_sha256,
+                        validate_zip=True,
+                    )
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            print()
+            print("ERROR: Couldn't download the update ->", e)
+            print("Run the script again to resume the download.")
+            exit()
 
     # Tests for some cases where something might go wrong
     zip_file = ""
@@ -193,42 +918,67 @@ def get_zip_file(path_file, path):
         )
         exit()
 
-    # Save the GTNH version
+    # Save the GTNH version, the zip is indexed once for the rest of the update
+    global gtnh_version
+    try:
+        gtnh_version = load_pack_index(zip_file)["version"]
+    except (OSError, zipfile.BadZipFile) as e:
+        print("ERROR: Couldn't read the zip file ->", e)
+        exit()
+
+    return zip_file
+
+
+def parse_gtnh_version(zip_file):
+    """Get the GTNH version from the name of the zip, e.g. "GT_New_Horizons_2.4.0_Client.zip"."""
+    zip_file = os.path.basename(zip_file)
     start_index = zip_file.find("_") + 1
-    while not zip_file[start_index].isdigit():
+    while start_index < len(zip_file) and not zip_file[start_index].isdigit():
         start_index += 1
 
     end_index = start_index
-    while zip_file[end_index].isdigit() or zip_file[end_index] == ".":
+    while end_index < len(zip_file) and (
+        zip_file[end_index].isdigit() or zip_file[end_index] == "."
+    ):
         end_index += 1
 
-    # Extract the version number
-    global gtnh_version
-    gtnh_version = zip_file[start_index:end_index]
+    return zip_file[start_index:end_index].rstrip(".")
 
-    # Copy the update to game directory
-    try:
-        game_dir_zip_file = path + "/" + zip_file
-        current_absolute_path = os.path.abspath(os.getcwd())
-        # Only occurs if the user is automatically updating with a launcher.
-        # If so, set a flag and skip the copy
-        if (current_absolute_path + "/" + zip_file) == game_dir_zip_file:
-            print(
-                "Detected script running within the game-directory, setting launcher flag..."
-            )
-            print()
-            global auto_update_on_game_launch
-            auto_update_on_game_launch = True
 
-        if not auto_update_on_game_launch:
-            shutil.copy(zip_file, game_dir_zip_file)
-    except:
-        print(
-            "ERROR: Path doesn't exist, or the zip file is already in the given path."
-        )
+def get_zip_file(path_file, path):
+    """Find the zip file, see find_zip_file.
+
+    The zip isn't copied to the game directory, it is extracted from where it is.
+    Returns the absolute path of the zip file.
+    """
+    # Before anything is downloaded, "--pipeline" extracts into the game directory
+    if not os.path.isdir(path):
+        print("ERROR: Path doesn't exist.")
         remove(path_file)
         exit()
 
+    zip_file = find_zip_file(path)
+
+    # Only occurs if the user is automatically updating with a launcher.
+    # If so, set a flag
+    game_dir_zip_file = path + "/" + zip_file
+    current_absolute_path = os.path.abspath(os.getcwd())
+    if (current_absolute_path + "/" + zip_file) == game_dir_zip_file:
+        print(
+            "Detected script running within the game-directory, setting launcher flag..."
+        )
+        print()
+        global auto_update_on_game_launch
+        auto_update_on_game_launch = True
+
+    # Leave the zip next to the script, like the copy of it used to.
+    # In the game directory it is the download itself, and removed once extracted.
+    # If it was extracted while downloading, extract_game_zip keeps it either way
+    if not auto_update_on_game_launch:
+        global keep_zip_file
+        keep_zip_file = True
+    zip_file = os.path.abspath(zip_file)
+
     print("GregTech zip has been found...", total_progress())
 
     return zip_file
@@ -242,8 +992,12 @@ def copy_dir_to_game(folder, path):
     if os.path.exists(path + "/" + folder):
         return
 
+    def copy_function(src, dst):
+        count_phase(files=1, bytes=os.path.getsize(src))
+        return store_copy(src, dst)
+
     if os.path.exists(folder):
-        shutil.copytree(folder, path + "/" + folder)
+        shutil.copytree(folder, path + "/" + folder, copy_function=copy_function)
     else:
         print("   -> No folder '" + folder[2:] + "' found. Skipping this step!")
 
@@ -260,10 +1014,8 @@ def add_dir_to_game(folder, path):
             if os.path.exists(path + "/" + file):
                 continue
 
-            if auto_update_on_game_launch:
-                shutil.copy(file_name, path)
-            else:
-                shutil.move(file_name, path)
+            count_phase(files=1, bytes=os.path.getsize(file_name))
+            place_file(file_name, path, move=not auto_update_on_game_launch)
 
         if not auto_update_on_game_launch:
             # Delete the folder from the game directory
@@ -293,6 +1045,150 @@ def merge_folders(src_folder, dest_folder):
             shutil.copy2(src_item, dest_item)
 
 
+def load_github_cache():
+    """Load the cached GitHub responses, "URL" -> {etag, last_modified, fetched, body}."""
+    try:
+        with open(github_cache_file, "r") as f:
+            cache = json.load(f)
+        if isinstance(cache, dict):
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def save_github_cache(cache):
+    """Save the cached GitHub responses, other instances may be saving it too."""
+    os.makedirs(os.path.dirname(github_cache_file), exist_ok=True)
+    temp = github_cache_file + "." + str(os.getpid()) + ".tmp"
+    with open(temp, "w") as f:
+        json.dump(cache, f)
+    os.replace(temp, github_cache_file)
+
+
+def get_github_cache_ttl():
+    """Get the number of seconds a cached GitHub API response is used for."""
+    try:
+        with open(github_cache_ttl_file, "r") as f:
+            return int(f.readline())
+    except (OSError, ValueError):
+        return github_cache_ttl
+
+
+def get_cached(url, ttl=0, accept=None):
+    """Get a small text file from GitHub, through the cache.
+
+    Responses younger than "ttl" seconds are used as is, otherwise a conditional
+    request is sent, so an unchanged file is never downloaded twice.
+    If GitHub is unreachable or rate limited, the cached response is used regardless of age.
+    """
+    cache = load_github_cache()
+    entry = cache.get(url)
+    if entry is not None and "body" not in entry:
+        entry = None
+    now = time.time()
+    if entry is not None and now - entry.get("fetched", 0) < ttl:
+        return entry["body"]
+
+    request = urllib.request.Request(url)
+    if accept:
+        request.add_header("Accept", accept)
+    if entry is not None and entry.get("etag"):
+        request.add_header("If-None-Match", entry["etag"])
+    if entry is not None and entry.get("last_modified"):
+        request.add_header("If-Modified-Since", entry["last_modified"])
+
+    try:
+        with urllib.request.urlopen(request, timeout=download_timeout) as response:
+            entry = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched": now,
+                "body": response.read().decode("utf-8"),
+            }
+    except urllib.error.HTTPError as e:
+        if entry is None:
+            raise
+        # Not modified, doesn't count towards the rate limit
+        if e.code == 304:
+            entry["fetched"] = now
+        else:
+            print(
+                "NOTE: GitHub responded with", e.code, "-> Using the cached response."
+            )
+            return entry["body"]
+    except (OSError, http.client.HTTPException, ValueError):
+        if entry is None:
+            raise
+        print("NOTE: GitHub is unreachable -> Using the cached response.")
+        return entry["body"]
+
+    # Merge with responses saved by other instances in the meantime
+    cache = load_github_cache()
+    cache[url] = entry
+    save_github_cache(cache)
+    return entry["body"]
+
+
+def get_github_json(url):
+    """Get a JSON response from the GitHub API, through the cache."""
+    return json.loads(
+        get_cached(url, get_github_cache_ttl(), "application/vnd.github+json")
+    )
+
+
+def update_version_file(version_file):
+    """Fetch the latest version of a file in "files/" from GitHub, only if it changed.
+
+    Keeps the local file if GitHub can't be reached.
+    """
+    try:
+        body = get_cached(
+            github_raw_url + os.path.normpath(version_file).replace(os.path.sep, "/")
+        )
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        print(
+            "NOTE: Couldn't check for a new version (" + str(e) + ") -> Using",
+            version_file,
+        )
+        print()
+        return
+
+    current = ""
+    if os.path.exists(version_file):
+        with open(version_file, "r") as f:
+            current = f.read()
+    if body != current:
+        with open(version_file, "w") as f:
+            f.write(body)
+
+
+def get_script_commit():
+    """Get the latest commit of the script on GitHub, None if it can't be found."""
+    try:
+        return get_github_json(github_commit_url)["sha"]
+    except (OSError, http.client.HTTPException, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_script_commit(commit):
+    """Remember which commit of the script is installed."""
+    if commit is None:
+        return
+    with open(script_commit_file, "w") as f:
+        f.write(commit)
+
+
+def is_script_outdated():
+    """Check if there is a new commit of the script, without downloading it."""
+    latest_commit = get_script_commit()
+    if latest_commit is None or not os.path.exists(script_commit_file):
+        return True
+
+    with open(script_commit_file, "r") as f:
+        return f.readline().strip() != latest_commit
+
+
 def get_latest_release_version(repo):
     """Get latest release version from GitHub for a given repository.
 
@@ -301,25 +1197,61 @@ def get_latest_release_version(repo):
     => 1.1.32
     """
     url = "https://api.github.com/repos/" + repo + "/releases/latest"
-    response = requests.get(url)
-    return response.json()["tag_name"]
+    return get_github_json(url)["tag_name"]
 
 
-def add_java_9_to_game(mods_dir):
-    """Add/update Java 9+ for client/server."""
+def get_java_9_version():
+    """Get the lwjgl3ify version to use for the GTNH version."""
     # Hard-coded values depending on GTNH version
-    version = ""
     if gtnh_version <= "2.3.0":
         # Java 17-19
-        version = "1.1.38"
+        return "1.1.38"
     elif gtnh_version == "2.3.1":
         # Java 17-19
-        version = "1.3.0"
+        return "1.3.0"
     elif gtnh_version == "2.3.2":
         # Java 17-20
-        version = "1.3.3"
+        return "1.3.3"
     else:
-        version = get_latest_release_version("GTNewHorizons/lwjgl3ify")
+        return get_latest_release_version("GTNewHorizons/lwjgl3ify")
+
+
+def get_cached_java_9_version():
+    """Get the most recently used lwjgl3ify version in the cache, None if there is none."""
+    try:
+        versions = [entry for entry in os.scandir(java_9_cache_dir) if entry.is_dir()]
+    except OSError:
+        return None
+    if not versions:
+        return None
+    return max(versions, key=lambda entry: entry.stat().st_mtime_ns).name
+
+
+def prune_java_9_cache():
+    """Remove all but the "java_9_cache_keep" most recently used versions of lwjgl3ify."""
+    try:
+        versions = [entry for entry in os.scandir(java_9_cache_dir) if entry.is_dir()]
+    except OSError:
+        return
+    versions.sort(key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+    for entry in versions[java_9_cache_keep:]:
+        # Servers of a batch may prune at the same time
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def download_java_9(side):
+    """Download lwjgl3ify and the patches for client/server, all at the same time.
+
+    The files are kept in "java_9_cache_dir", only the missing ones are downloaded.
+    If GitHub can't be reached, the most recently used version in the cache is used.
+    Returns the version, and a dictionary with the path of each file.
+    """
+    try:
+        version = get_java_9_version()
+    except (OSError, http.client.HTTPException, ValueError, KeyError, TypeError):
+        version = get_cached_java_9_version()
+        if version is None:
+            raise
 
     # Set variable names to be used
     mod_name = "lwjgl3ify"
@@ -331,56 +1263,200 @@ def add_java_9_to_game(mods_dir):
         + mod_name_latest
     )
 
-    jar_url = main_url + ".jar"
-    jar_file = mod_name_latest + ".jar"
+    # "name" -> (URL, file name, is zip)
+    downloads = {"jar": (main_url + ".jar", mod_name_latest + ".jar", False)}
+    if side == "client":
+        downloads["patches"] = (
+            main_url + "-multimc.zip",
+            mod_name_latest + "-multimc.zip",
+            True,
+        )
+    elif side == "server":
+        downloads["forge"] = (
+            main_url + "-forgePatches.jar",
+            mod_name + "-forgePatches.jar",
+            False,
+        )
 
-    patches_url = main_url + "-multimc.zip"
-    patches_file = mod_name_latest + "-multimc.zip"
+    download_dir = os.path.join(java_9_cache_dir, version)
+    os.makedirs(download_dir, exist_ok=True)
+    # Most recently used, see prune_java_9_cache
+    os.utime(download_dir)
+
+    # Files are only renamed into the cache once verified, see download_file
+    files = {}
+    missing = []
+    for name, (url, file_name, is_zip) in downloads.items():
+        files[name] = os.path.join(download_dir, file_name)
+        if not os.path.isfile(files[name]):
+            missing.append((url, files[name], is_zip))
+
+    if missing:
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(missing)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    download_file, url, file, validate_zip=is_zip, quiet=True
+                )
+                for url, file, is_zip in missing
+            ]
+            for future in futures:
+                future.result()
+
+    prune_java_9_cache()
+    return version, files
+
+
+def prefetch_java_9():
+    """Start downloading Java 9+ in the background, while the update is installed.
+
+    Returns a future, its result is the version & the dictionary from download_java_9.
+    """
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(download_java_9, arg)
+    executor.shutdown(wait=False)
+    return future
 
-    forge_url = main_url + "-forgePatches.jar"
-    forge_file = mod_name + "-forgePatches.jar"
 
-    if arg == "client":
-        # Move to instance directory
-        os.chdir("..")
+def load_artifacts():
+    """Load the record of what was added on top of the pack, "component" -> entry.
 
-        # Download the mod and patches for the launcher
-        urllib.request.urlretrieve(jar_url, jar_file)
-        urllib.request.urlretrieve(patches_url, patches_file)
+    Each entry has the "version", the "side" and the "files" as
+    "path relative to the game directory" -> [size, crc, mtime].
+    Returns None if there is no record, e.g. the instance was updated by an older script.
+    """
+    try:
+        with open(artifacts_file, "r") as f:
+            artifacts = json.load(f)
+        if isinstance(artifacts, dict):
+            return artifacts
+    except (OSError, ValueError):
+        pass
+    return None
 
-        # Move the jar file into the mod directory
-        for object in os.listdir("."):
-            if object.endswith("minecraft"):
-                shutil.move(jar_file, object + "/" + mods_dir + jar_file)
-                break
 
-        # Extract patches and replace if files already exists
-        with zipfile.ZipFile(patches_file, "r") as zip_ref:
-            zip_ref.extractall(".")
+def get_artifact_files():
+    """Get the files of every recorded artifact, relative to the game directory."""
+    files = set()
+    for entry in (load_artifacts() or {}).values():
+        files.update(entry.get("files", {}))
+    return files
 
-        # Cleanup
-        remove(patches_file)
 
+def is_artifact_intact(path, expected, recorded):
+    """Check if an installed file has the size & CRC in "expected".
+
+    Files with the same size & mtime as when "recorded" aren't checksummed.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if stat.st_size != expected[0]:
+        return False
+    if (
+        recorded is not None
+        and list(recorded[:2]) == list(expected)
+        and len(recorded) > 2
+        and stat.st_mtime_ns == recorded[2]
+    ):
+        return True
+    return file_crc32(path) == expected[1]
+
+
+def add_java_9_to_game(mods_dir, downloads):
+    """Add/update Java 9+ for client/server.
+
+    The files are downloaded in the background by prefetch_java_9,
+    wait for them if they aren't done yet.
+    Only the files that are missing or differ from the downloads are installed,
+    and files of a previous version that aren't part of this one are removed.
+    What was installed is recorded in "artifacts_file".
+    """
+    version, files = downloads.result()
+    jar_file = os.path.basename(files["jar"])
+
+    # "path relative to the game directory" -> (downloaded file, zip member or None)
+    sources = {
+        os.path.normpath(mods_dir + jar_file).replace(os.path.sep, "/"): (
+            files["jar"],
+            None,
+        )
+    }
+    # "path" -> [size, crc]
+    expected = {}
+    if arg == "client":
+        # The patches go into the instance directory, next to the game directory
+        with zipfile.ZipFile(files["patches"], "r") as zip_ref:
+            for info in zip_ref.infolist():
+                if not info.is_dir():
+                    path = "../" + info.filename
+                    sources[path] = (files["patches"], info.filename)
+                    expected[path] = [info.file_size, info.CRC]
     elif arg == "server":
-        # Download the mod and forge patches
-        urllib.request.urlretrieve(jar_url, jar_file)
-        urllib.request.urlretrieve(forge_url, forge_file)
+        # The forge patches go next to the server
+        sources[os.path.basename(files["forge"])] = (files["forge"], None)
+    for path, (file, member) in sources.items():
+        if member is None:
+            expected[path] = [os.path.getsize(file), file_crc32(file)]
+
+    artifacts = load_artifacts() or {}
+    recorded = artifacts.get("lwjgl3ify", {}).get("files", {})
+
+    # Files of another version or Java version
+    for path in recorded:
+        if path not in sources:
+            remove(os.path.normpath(path))
+
+    record = {}
+    installed = 0
+    for path, (file, member) in sources.items():
+        dst = os.path.normpath(path)
+        if not is_artifact_intact(dst, expected[path], recorded.get(path)):
+            remove(dst)
+            if member is None:
+                store_copy(file, dst)
+            else:
+                with zipfile.ZipFile(file, "r") as zip_ref:
+                    zip_ref.extract(member, os.path.normpath(".."))
+            count_phase(files=1, bytes=expected[path][0])
+            installed += 1
+        record[path] = expected[path] + [get_mtime(dst)]
+
+    if installed == 0:
+        print("   -> lwjgl3ify", version, "is already installed.")
 
-        # Move the jar file into the mod directory
-        shutil.move(jar_file, mods_dir + jar_file)
+    artifacts["lwjgl3ify"] = {"version": version, "side": arg, "files": record}
+    write_json(os.path.abspath(artifacts_file), artifacts)
+
+    if arg == "client":
+        # Move to instance directory
+        os.chdir("..")
 
 
 def remove_java_9_from_game():
     """Remove Java 9+ support from the client.
 
     Only thing that is required to change if the user has downloaded Java 9+ version
-    is to delete the "patches" folder located in the instance folder."""
+    is to delete the "patches" folder located in the instance folder, and the lwjgl3ify jar.
+    Nothing is done if the record says lwjgl3ify isn't installed.
+    """
+    artifacts = load_artifacts()
+    installed = (artifacts or {}).pop("lwjgl3ify", None)
+    if artifacts is None or installed is not None:
+        # The jar, the other files of the patches are left as they were
+        for path in (installed or {}).get("files", {}):
+            if not path.startswith("../"):
+                remove(os.path.normpath(path))
+
+        # Only file required to remove to go back to Java 8
+        remove(os.path.normpath("../patches/"))
+        write_json(os.path.abspath(artifacts_file), artifacts or {})
+
     # Move to instance directory
     os.chdir("..")
 
-    # Only file required to remove to go back to Java 8
-    remove("patches/")
-
 
 def add_shaders_to_game(folder):
     """Add shaders & configs.
@@ -395,28 +1471,17 @@ def add_shaders_to_game(folder):
     shaders_files = os.listdir(folder)
     for file in shaders_files:
         src = folder + "/" + file
+        count_phase(files=1, bytes=os.path.getsize(src))
 
         if file.casefold().startswith("OptiFine".casefold()):
             dst = os.path.join("mods/", file)
-            if auto_update_on_game_launch:
-                shutil.copy(src, dst)
-            else:
-                shutil.move(src, dst)
-
         elif file.startswith("options"):
             dst = os.path.join(file)
             remove(file)
-            if auto_update_on_game_launch:
-                shutil.copy(src, dst)
-            else:
-                shutil.move(src, dst)
-
         else:
             dst = os.path.join("shaderpacks/", file)
-            if auto_update_on_game_launch:
-                shutil.copy(src, dst)
-            else:
-                shutil.move(src, dst)
+
+        place_file(src, dst, move=not auto_update_on_game_launch)
 
     if not auto_update_on_game_launch:
         # Delete the folder from the game directory
@@ -437,61 +1502,1498 @@ def remove(object):
         shutil.rmtree(object)
 
 
+def delete_in_background(path):
+    """Delete a trashed tree, with the lowest priority so it doesn't slow down the update."""
+    try:
+        # The niceness of a thread on Linux, it sets the I/O priority as well
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def move_to_trash(path):
+    """Rename a file/folder into the trash, and delete it in the background.
+
+    The rename is instant, the new files are extracted while the old ones are deleted.
+    Call empty_trash at the end, to wait for it.
+    """
+    global trash_path, trash_executor
+    if not os.path.isdir(path) or os.path.islink(path):
+        remove(path)
+        return
+
+    # Absolute, the update moves around while the trash is deleted
+    if trash_executor is None:
+        trash_path = os.path.abspath(trash_dir)
+        os.makedirs(trash_path, exist_ok=True)
+        trash_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        # Left behind by an interrupted update
+        for name in os.listdir(trash_path):
+            trash_futures.append(
+                trash_executor.submit(
+                    delete_in_background, os.path.join(trash_path, name)
+                )
+            )
+
+    trashed = os.path.join(
+        trash_path, os.path.basename(path) + "-" + str(len(trash_futures))
+    )
+    try:
+        os.rename(path, trashed)
+    except OSError:
+        remove(path)
+        return
+    trash_futures.append(trash_executor.submit(delete_in_background, trashed))
+
+
+def empty_trash():
+    """Wait for the trash to be deleted, see move_to_trash."""
+    global trash_path, trash_executor, trash_futures
+    if trash_executor is None:
+        return
+
+    for future in trash_futures:
+        future.result()
+    trash_executor.shutdown()
+    remove(trash_path)
+    trash_path = ""
+    trash_executor = None
+    trash_futures = []
+
+
+def compile_protected(protected):
+    """Build a matcher for the protected configs, once per list.
+
+    A pattern matches the last components of a path, e.g. "GregTech/GregTech.cfg"
+    matches "config/GregTech/GregTech.cfg". A pattern for a folder, e.g. "NEI/",
+    matches the folder itself. "*", "?" and "[...]" work like globs within a component.
+    Returns a function that checks a tuple of path components.
+    """
+    # Last component -> patterns, so most paths are ruled out by a single lookup
+    exact = {}
+    globs = []
+    for pattern in protected:
+        parts = tuple(
+            part
+            for part in pattern.replace("\\", "/").split("/")
+            if part not in ("", ".")
+        )
+        if not parts:
+            continue
+        if any(char in pattern for char in "*?["):
+            globs.append(tuple(re.compile(fnmatch.translate(part)) for part in parts))
+        else:
+            exact.setdefault(parts[-1], []).append(parts)
+
+    def is_protected(components):
+        for parts in exact.get(components[-1], ()):
+            if components[-len(parts) :] == parts:
+                return True
+        for parts in globs:
+            if len(parts) <= len(components) and all(
+                part.match(component)
+                for part, component in zip(parts, components[-len(parts) :])
+            ):
+                return True
+        return False
+
+    return is_protected
+
+
+def find_unprotected(folder, components, is_protected, found):
+    """Collect the files in a folder that aren't protected, skips protected folders."""
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            entry_components = components + (entry.name,)
+            if is_protected(entry_components):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                find_unprotected(entry.path, entry_components, is_protected, found)
+            elif not entry.is_dir():
+                found.append(entry.path)
+
+
 def remove_configs(protected):
     """Remove all config files/folders except a select few."""
+    is_protected = compile_protected(protected)
     try:
-        for root, dirs, files in os.walk("./config/"):
-            # Create a copy of the dirs list to avoid modifying the original list
-            # While iterating over it
-            dirs_copy = dirs[:]
-            for dirname in dirs_copy:
-                # Construct the full directory path
-                dir_path = os.path.join(root, dirname)
-                # Check if the directory is in the protected list
-                if any(
-                    os.path.normpath(dir_path).endswith(os.path.normpath(p))
-                    for p in protected
-                ):
-                    # Remove the directory from the list of directories to be searched
-                    dirs.remove(dirname)
-            for filename in files:
-                # Construct the full file path
-                file_path = os.path.join(root, filename)
-                # Check if the file is not in the protected list
-                if any(
-                    os.path.normpath(file_path).endswith(os.path.normpath(p))
-                    for p in protected
-                ):
-                    continue
-                # Delete the file
-                os.remove(file_path)
+        # Find everything first, then delete it all at once
+        to_remove = []
+        find_unprotected("./config/", ("config",), is_protected, to_remove)
+        for file_path in to_remove:
+            os.remove(file_path)
+        count_phase(files=len(to_remove))
     except:
         print(
             "ERROR: Invalid path, double-check that the path has the folders: 'config', 'mods', etc."
         )
 
 
-def extract_game_zip(file, pwd=None):
-    """Extract the update file without overwriting existing files."""
-    print("Exctracting files...", total_progress())
+def reflink(src, dst):
+    """Copy a file by sharing its data blocks, raises OSError if not supported."""
+    if fcntl is None:
+        raise OSError("reflinks are not supported")
 
-    # Unzip the zip file without overwriting any existing files
-    with zipfile.ZipFile(file) as zf:
-        for member in zf.namelist():
-            dst_path = os.path.normpath(member.replace("/", os.path.sep))
-            if not os.path.exists(dst_path):
-                zf.extract(member, ".", pwd)
+    # FICLONE, supported by e.g. Btrfs and XFS
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), 0x40049409, src_file.fileno())
+        except OSError:
+            dst_file.close()
+            os.remove(dst)
+            raise
 
-    print("Cleaning up from extraction...", total_progress())
 
-    # Remove zip file
-    remove(file)
+def link_or_copy(src, dst):
+    """Hardlink a file, otherwise reflink it, otherwise copy it.
 
-    # Remove previous change-log files
+    An existing destination is removed first, it may be a hardlink to the store.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+
+    copy_file(src, dst)
+
+
+def kernel_copy(src, dst):
+    """Copy a file inside the kernel with copy_file_range, raises OSError if not supported.
+
+    Some filesystems share the data blocks, like a reflink.
+    """
+    if not hasattr(os, "copy_file_range"):
+        raise OSError("copy_file_range is not supported")
+
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        try:
+            size = os.fstat(src_file.fileno()).st_size
+            copied = 0
+            while copied < size:
+                count = os.copy_file_range(
+                    src_file.fileno(), dst_file.fileno(), size - copied
+                )
+                if count == 0:
+                    break
+                copied += count
+        except OSError:
+            dst_file.close()
+            os.remove(dst)
+            raise
+
+
+def copy_file(src, dst):
+    """Copy a file with its metadata, the cheapest way the filesystems allow.
+
+    Reflink, otherwise copy_file_range, otherwise shutil, which uses sendfile when it can.
+    """
+    try:
+        reflink(src, dst)
+    except OSError:
+        try:
+            kernel_copy(src, dst)
+        except OSError:
+            shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+    return dst
+
+
+def place_file(src, dst, move=False):
+    """Put a file in place, moves are renames and copies go through store_copy.
+
+    Only copies across drives write every byte again.
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+
+    if move:
+        try:
+            os.replace(src, dst)
+            return dst
+        except OSError:
+            # Another drive
+            pass
+
+    store_copy(src, dst)
+    if move:
+        os.remove(src)
+    return dst
+
+
+def file_crc32(path):
+    """Calculate the CRC32 of a file, the same checksum as in a zip file."""
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(download_chunk_size), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def file_sha256(path):
+    """Calculate the SHA-256 of a file, as a hex string."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(download_chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_path(sha256):
+    """Get the path of a file in the store, the key is its SHA-256."""
+    return os.path.join(store_dir, sha256[:2], sha256)
+
+
+def check_store(directory="."):
+    """Check if files in the store can be hardlinked to a directory, once per drive.
+
+    Without hardlinks the store only adds an extra copy, so it isn't used.
+    """
+    try:
+        device = os.stat(directory).st_dev
+    except OSError:
+        return False
+
+    if device not in store_supported:
+        probe = os.path.join(store_dir, "probe-" + str(os.getpid()))
+        probe_link = os.path.join(directory, ".gtnh-updater-probe-" + str(os.getpid()))
+        try:
+            os.makedirs(store_dir, exist_ok=True)
+            with open(probe, "w"):
+                pass
+            os.link(probe, probe_link)
+            store_supported[device] = True
+        except OSError:
+            store_supported[device] = False
+        remove(probe_link)
+        remove(probe)
+
+    return store_supported[device]
+
+
+def is_store_entry_intact(entry, size, crc):
+    """Check a store entry against the member it was inflated from.
+
+    A jar written in place changes the entry, and every instance linked to it.
+    Reading it back is still much faster than inflating the member again.
+    """
+    try:
+        return os.path.getsize(entry) == size and file_crc32(entry) == crc
+    except OSError:
+        return False
+
+
+def add_to_store(src, sha256, move=False):
+    """Add a file to the store, if it isn't there already. Returns the stored file."""
+    entry = store_path(sha256)
+    if os.path.exists(entry) and os.path.getsize(entry) == os.path.getsize(src):
+        if move:
+            os.remove(src)
+        return entry
+
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    # Unique name, other threads/instances may store the same file at the same time
+    temp = entry + "." + str(os.getpid()) + "-" + str(threading.get_ident()) + ".tmp"
+    if move:
+        os.replace(src, temp)
+    else:
+        try:
+            reflink(src, temp)
+        except OSError:
+            copy_file(src, temp)
+    os.replace(temp, entry)
+    return entry
+
+
+def store_copy(src, dst):
+    """Copy a file through the store, the destination becomes a hardlink.
+
+    Files that aren't jars or zips, e.g. configs, are copied as usual.
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+
+    if not src.casefold().endswith(store_extensions) or not check_store(
+        os.path.dirname(dst) or "."
+    ):
+        return copy_file(src, dst)
+
+    entry = add_to_store(src, file_sha256(src))
+    link_or_copy(entry, dst)
+    return dst
+
+
+def find_store_entries(paths):
+    """Find the files in the store that any of the files are hardlinks of."""
+    inodes = set()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if stat.st_nlink > 1:
+            inodes.add((stat.st_dev, stat.st_ino))
+
+    entries = []
+    if not inodes:
+        return entries
+    for root, dirs, files in os.walk(store_dir):
+        for name in files:
+            entry = os.path.join(root, name)
+            try:
+                stat = os.stat(entry)
+            except OSError:
+                continue
+            if (stat.st_dev, stat.st_ino) in inodes:
+                entries.append(entry)
+    return entries
+
+
+def prune_store():
+    """Remove files from the store that no instance is linked to anymore."""
+    if not os.path.isdir(store_dir):
+        return
+
+    for root, dirs, files in os.walk(store_dir, topdown=False):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.stat(path).st_nlink == 1:
+                    os.remove(path)
+            except OSError:
+                pass
+        if root != store_dir and not os.listdir(root):
+            os.rmdir(root)
+
+
+def scan_existing_paths(members):
+    """Collect every existing path below the top-level folders of the members.
+
+    One directory scan replaces a stat call per member.
+    """
+    existing = set()
+    top_levels = {member.split("/", 1)[0] for member in members}
+    for top_level in top_levels:
+        if not os.path.isdir(top_level):
+            if os.path.lexists(top_level):
+                existing.add(os.path.normpath(top_level))
+            continue
+
+        existing.add(os.path.normpath(top_level))
+        for root, dirs, files in os.walk(top_level):
+            for name in dirs + files:
+                existing.add(os.path.normpath(os.path.join(root, name)))
+
+    return existing
+
+
+def extract_members(file, members, pwd=None, use_store=False, hashes=None):
+    """Extract members with a separate zip file handle, used by the workers.
+
+    Jars & zips are inflated into the store once, and then hardlinked.
+    A member whose SHA-256 is in "hashes" is linked without being inflated,
+    if the store has it and it still matches the member, see is_store_entry_intact.
+    Returns the SHA-256 of the members that were inflated.
+    """
+    hashes = hashes or {}
+    inflated = {}
+    with zipfile.ZipFile(file) as zf:
+        for member in members:
+            info = zf.getinfo(member)
+            try:
+                dst_path = safe_member_path(member)
+            except ValueError:
+                dst_path = ""
+            if not dst_path or not (
+                use_store and member.casefold().endswith(store_extensions)
+            ):
+                zf.extract(member, ".", pwd)
+                continue
+
+            entry = store_path(hashes[member]) if member in hashes else ""
+            if entry and not is_store_entry_intact(entry, info.file_size, info.CRC):
+                remove(entry)
+                entry = ""
+            if not entry:
+                temp = dst_path + ".tmp"
+                digest = hashlib.sha256()
+                with zf.open(info, pwd=pwd) as src, open(temp, "wb") as dst:
+                    for chunk in iter(lambda: src.read(download_chunk_size), b""):
+                        digest.update(chunk)
+                        dst.write(chunk)
+                inflated[member] = digest.hexdigest()
+                entry = add_to_store(temp, inflated[member], move=True)
+            link_or_copy(entry, dst_path)
+
+    return inflated
+
+
+def compile_prefixes(prefixes):
+    """Build a case-insensitive matcher for names starting with any of the prefixes."""
+    prefixes = tuple(prefix.casefold() for prefix in prefixes)
+    return lambda name: name.casefold().startswith(prefixes)
+
+
+def compile_profile(name):
+    """Build the exclude function of an extraction profile, see extraction_profiles.
+
+    Returns None if the profile extracts everything.
+    """
+    profile = extraction_profiles[name]
+    if (
+        profile["include"] == ["*"]
+        and not profile["exclude"]
+        and not profile["exclude_mods"]
+    ):
+        return None
+
+    include = re.compile(
+        "|".join(fnmatch.translate(glob) for glob in profile["include"])
+    )
+    exclude = None
+    if profile["exclude"]:
+        exclude = re.compile(
+            "|".join(fnmatch.translate(glob) for glob in profile["exclude"])
+        )
+    is_excluded_mod = compile_prefixes(profile["exclude_mods"])
+
+    def is_excluded(member):
+        if not include.match(member) or (exclude is not None and exclude.match(member)):
+            return True
+        mod = member[len("mods/") :]
+        return member.startswith("mods/") and "/" not in mod and is_excluded_mod(mod)
+
+    return is_excluded
+
+
+def extract_game_zip(file, pwd=None, members=None, exclude=None):
+    """Extract the update file without overwriting existing files.
+
+    If "members" is given, only those members are extracted.
+    If "exclude" is given, members it returns True for are never inflated nor written.
+    The members are inflated across a pool of workers, each with its own zip file handle.
+    If the zip was extracted while downloading, the staged files are moved instead.
+    Jars & zips go through the store, so instances on the same drive share them.
+    Returns the members that were skipped because they already exist.
+    """
+    print("Exctracting files...", total_progress())
+
+    infos = get_pack_infos(file)
+    if members is not None:
+        wanted = set(members)
+        infos = [info for info in infos if info.filename in wanted]
+    if exclude is not None:
+        infos = [info for info in infos if not exclude(info.filename)]
+
+    # Unzip the zip file without overwriting any existing files
+    existing = scan_existing_paths([info.filename for info in infos])
+    to_extract = []
+    skipped = []
+    target_dirs = set()
+    for info in infos:
+        dst_path = os.path.normpath(info.filename.replace("/", os.path.sep))
+        if dst_path in existing:
+            if not info.is_dir():
+                skipped.append(info.filename)
+            continue
+        if info.is_dir():
+            target_dirs.add(dst_path)
+        else:
+            target_dirs.add(os.path.dirname(dst_path))
+            to_extract.append(info)
+
+    # Create the folders once, so the workers never race each other
+    for target_dir in sorted(target_dirs):
+        if target_dir:
+            os.makedirs(target_dir, exist_ok=True)
+
+    # Share jars & zips with other instances, if possible
+    use_store = check_store()
+    hashes = load_pack_index(file).get("hashes", {})
+    inflated = {}
+
+    count_phase(files=len(to_extract), bytes=sum(info.file_size for info in to_extract))
+
+    # Already extracted while downloading, move the files into place
+    if pipeline_staging_dir:
+        for info in to_extract:
+            staged = os.path.join(pipeline_staging_dir, safe_member_path(info.filename))
+            dst_path = os.path.normpath(info.filename.replace("/", os.path.sep))
+            if use_store and info.filename.casefold().endswith(store_extensions):
+                inflated[info.filename] = file_sha256(staged)
+                staged = add_to_store(staged, inflated[info.filename], move=True)
+                link_or_copy(staged, dst_path)
+            else:
+                os.replace(staged, dst_path)
+        to_extract = []
+
+    # Spread the members over the workers, largest first to balance the load
+    to_extract.sort(key=lambda info: info.compress_size, reverse=True)
+    workers = max(1, min(extract_workers, len(to_extract)))
+    chunks = [[] for _ in range(workers)]
+    for i, info in enumerate(to_extract):
+        chunks[i % workers].append(info)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                extract_members,
+                file,
+                # Read each chunk in archive order
+                [
+                    info.filename
+                    for info in sorted(chunk, key=lambda i: i.header_offset)
+                ],
+                pwd,
+                use_store,
+                hashes,
+            )
+            for chunk in chunks
+        ]
+        for future in futures:
+            inflated.update(future.result())
+
+    # The next extraction of the pack links these without inflating them
+    if inflated:
+        save_member_hashes(file, inflated)
+
+    print("Cleaning up from extraction...", total_progress())
+
+    # Remove zip file, unless it is the download itself and not a copy
+    if pipeline_staging_dir:
+        remove(pipeline_staging_dir)
+    elif not keep_zip_file:
+        remove(file)
+
+    # Remove previous change-log files
     for file in os.listdir():
         if file.startswith("changelog from"):
             remove(file)
 
+    return skipped
+
+
+def hash_central_directory(file, start_dir):
+    """Hash everything from the central directory to the end of a zip, identifies the pack."""
+    sha256 = hashlib.sha256()
+    with open(file, "rb") as f:
+        f.seek(start_dir)
+        for chunk in iter(lambda: f.read(download_chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def build_pack_index(file):
+    """Parse the central directory of a zip into a pack index, see load_pack_index."""
+    members = {}
+    dirs = []
+    tree = {}
+    with zipfile.ZipFile(file) as zf:
+        start_dir = zf.start_dir
+        for info in zf.infolist():
+            if info.is_dir():
+                dirs.append(info.filename)
+                continue
+            members[info.filename] = [
+                info.file_size,
+                info.CRC,
+                info.header_offset,
+                info.compress_size,
+            ]
+            # Files & bytes of each top-level folder
+            top_level = tree.setdefault(info.filename.split("/", 1)[0], [0, 0])
+            top_level[0] += 1
+            top_level[1] += info.file_size
+
+    return {
+        "name": os.path.basename(file),
+        "version": parse_gtnh_version(file),
+        "start_dir": start_dir,
+        "sha256": hash_central_directory(file, start_dir),
+        "members": members,
+        "dirs": dirs,
+        "tree": tree,
+    }
+
+
+def write_json(path, data):
+    """Write a JSON file atomically, other processes may read it at the same time."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = path + "." + str(os.getpid()) + ".tmp"
+    with open(temp, "w") as f:
+        json.dump(data, f)
+    os.replace(temp, path)
+
+
+def load_pack_index(file):
+    """Get the index of a zip, parsing its central directory only the first time.
+
+    The index has the "version", the "members" as "name" -> [size, crc, offset,
+    compressed size], the "dirs", and the "tree" as "top-level" -> [files, bytes].
+    The "hashes" of the jars & zips that were inflated are added by save_member_hashes.
+    It is found by the size & mtime of the zip. A copy of a known zip is found
+    by the hash of its central directory instead.
+    """
+    stat = os.stat(file)
+    key = str(stat.st_size) + "-" + str(stat.st_mtime_ns)
+    cached = pack_indexes.get((os.path.abspath(file), key))
+    if cached is not None:
+        return cached
+
+    lookup_file = os.path.join(pack_index_dir, "packs.json")
+    try:
+        with open(lookup_file, "r") as f:
+            lookup = json.load(f)
+    except (OSError, ValueError):
+        lookup = {}
+
+    # Known by its size & mtime, or a copy of a known zip with the same central directory
+    candidates = [lookup[key]] if key in lookup else []
+    candidates += [
+        sha256
+        for other_key, sha256 in lookup.items()
+        if other_key.split("-")[0] == str(stat.st_size) and sha256 not in candidates
+    ]
+    index = None
+    for sha256 in candidates:
+        try:
+            with open(os.path.join(pack_index_dir, sha256 + ".json"), "r") as f:
+                index = json.load(f)
+            if lookup.get(key) == sha256:
+                break
+            if hash_central_directory(file, index["start_dir"]) == sha256:
+                break
+        except (OSError, ValueError, KeyError):
+            pass
+        index = None
+
+    if index is None:
+        index = build_pack_index(file)
+        write_json(os.path.join(pack_index_dir, index["sha256"] + ".json"), index)
+
+    if lookup.get(key) != index["sha256"]:
+        lookup[key] = index["sha256"]
+        prune_pack_indexes(lookup)
+        write_json(lookup_file, lookup)
+
+    pack_indexes[(os.path.abspath(file), key)] = index
+    return index
+
+
+def prune_pack_indexes(lookup):
+    """Only keep the indexes of the last few packs, removes the others from "lookup"."""
+    indexes = []
+    for name in os.listdir(pack_index_dir):
+        if name.endswith(".json") and name != "packs.json":
+            path = os.path.join(pack_index_dir, name)
+            indexes.append((os.path.getmtime(path), name[: -len(".json")]))
+    indexes.sort(reverse=True)
+
+    for mtime, sha256 in indexes[pack_index_keep:]:
+        remove(os.path.join(pack_index_dir, sha256 + ".json"))
+    kept = {sha256 for mtime, sha256 in indexes[:pack_index_keep]}
+    for key in [key for key, sha256 in lookup.items() if sha256 not in kept]:
+        del lookup[key]
+
+
+def save_member_hashes(file, hashes):
+    """Add the SHA-256 of members to the pack index, see extract_members."""
+    index = load_pack_index(file)
+    index.setdefault("hashes", {}).update(hashes)
+    write_json(os.path.join(pack_index_dir, index["sha256"] + ".json"), index)
+
+
+def get_pack_infos(file):
+    """Get the members of a zip as ZipInfo objects, from the pack index."""
+    index = load_pack_index(file)
+    infos = [zipfile.ZipInfo(name) for name in index["dirs"]]
+    for name, (size, crc, offset, compress_size) in index["members"].items():
+        info = zipfile.ZipInfo(name)
+        info.file_size = size
+        info.CRC = crc
+        info.header_offset = offset
+        info.compress_size = compress_size
+        infos.append(info)
+    return infos
+
+
+def read_zip_index(file):
+    """Read the central directory of a zip file, without inflating anything.
+
+    The central directory is only parsed once, see load_pack_index.
+    Returns a dictionary of "member name" -> [size, crc], directories are skipped.
+    """
+    return {name: entry[:2] for name, entry in load_pack_index(file)["members"].items()}
+
+
+def load_manifest():
+    """Load the manifest of what the previous update installed, if any."""
+    try:
+        with open(manifest_file, "r") as f:
+            manifest = json.load(f)
+        if isinstance(manifest.get("files"), dict):
+            return manifest
+    except (OSError, ValueError, AttributeError):
+        pass
+    return None
+
+
+def get_mtime(member):
+    """Get the mtime of an installed file in nanoseconds, 0 if it doesn't exist."""
+    try:
+        return os.stat(member).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def save_manifest(index, edited=(), previous=None, skipped=()):
+    """Save the zip index of the installed update, used for delta updates & verify.
+
+    Each member is saved as [size, crc, mtime], the mtime of the installed file
+    lets verify_instance skip the checksum of files that haven't changed since.
+    Members that are the same as in the "previous" manifest weren't touched,
+    they keep their mtime, the operator may have edited them since.
+    "edited" configs were kept instead of installed, their mtime is left out so
+    they are always checksummed.
+    "skipped" members already existed and weren't extracted, they are the
+    operator's and are left out, so verify & repair leave them alone.
+    """
+    edited = set(edited)
+    skipped = set(skipped)
+    previous = previous or {}
+    files = {}
+    for member, entry in index.items():
+        if member in skipped:
+            continue
+        old_entry = previous.get(member)
+        if member in edited:
+            mtime = 0
+        elif old_entry is not None and list(old_entry[:2]) == list(entry[:2]):
+            mtime = old_entry[2] if len(old_entry) > 2 else get_mtime(member)
+        else:
+            mtime = get_mtime(member)
+        files[member] = list(entry[:2]) + [mtime]
+    write_manifest({"version": gtnh_version, "files": files})
+
+
+def write_manifest(manifest):
+    """Write a manifest, see save_manifest."""
+    write_json(manifest_file, manifest)
+
+
+def compute_delta(old_index, new_index):
+    """Compare two zip indexes and return (added, changed, removed, unchanged).
+
+    Only the size & CRC are compared, manifests also have the mtime.
+    """
+    added = []
+    changed = []
+    unchanged = []
+    for name, entry in new_index.items():
+        old_entry = old_index.get(name)
+        if old_entry is None:
+            added.append(name)
+        elif list(old_entry[:2]) != list(entry[:2]):
+            changed.append(name)
+        else:
+            unchanged.append(name)
+
+    removed = [name for name in old_index if name not in new_index]
+    return added, changed, removed, unchanged
+
+
+def remove_empty_parents(path):
+    """Remove empty parent folders of a deleted file, stop at the game directory."""
+    parent = os.path.dirname(path)
+    while parent not in ("", "."):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
+
+
+def find_stray_files(to_update, index):
+    """Find files in the updated folders that aren't part of the update.
+
+    E.g. additional mods from the previous update, these are added again afterwards.
+    Recorded artifacts, e.g. lwjgl3ify, are left to add_java_9_to_game.
+    """
+    artifacts = get_artifact_files()
+    stray = []
+    for top_level in to_update:
+        if (
+            os.path.isfile(top_level)
+            and top_level not in index
+            and top_level not in artifacts
+        ):
+            stray.append(top_level)
+        for root, dirs, files in os.walk(top_level):
+            for name in files:
+                member = os.path.join(root, name).replace(os.path.sep, "/")
+                if member not in index and member not in artifacts:
+                    stray.append(member)
+
+    return stray
+
+
+def is_updated_member(member, to_update):
+    """Check if a member is in one of the updated folders, these are replaced by the pack."""
+    return member.split("/", 1)[0] in to_update
+
+
+def is_protected_member(member, is_protected):
+    """Check if a member is a protected config, or in a protected folder."""
+    components = tuple(member.split("/"))
+    return member.startswith("config/") and any(
+        is_protected(components[:i]) for i in range(2, len(components) + 1)
+    )
+
+
+def matches_entry(member, entry):
+    """Check if an installed file has the size & CRC of a zip index entry."""
+    try:
+        if os.stat(member).st_size != entry[0]:
+            return False
+    except OSError:
+        return False
+    return file_crc32(member) == entry[1]
+
+
+def is_config_edited(member, entry):
+    """Check if the operator edited a config since it was installed.
+
+    "entry" is the manifest entry, a config with its size & mtime is assumed unedited.
+    Deleted configs aren't edited, they are installed again.
+    """
+    try:
+        stat = os.stat(member)
+    except OSError:
+        return False
+    if stat.st_size != entry[0]:
+        return True
+    if len(entry) > 2 and entry[2] and stat.st_mtime_ns == entry[2]:
+        return False
+    return file_crc32(member) != entry[1]
+
+
+def reconcile_configs(old_index, new_index, added, changed, removed, is_protected):
+    """Three-way merge of the configs: the old pack, the new pack & the instance.
+
+    Configs the pack changed are only replaced if the operator didn't edit them,
+    edited ones are kept. If both changed a config it is a conflict.
+    Protected configs are always kept, they are left out.
+    Returns the configs to keep as they are, and the conflicts.
+    """
+    kept = []
+    conflicts = []
+    for member in changed + removed:
+        entry = old_index.get(member)
+        if (
+            not member.startswith("config/")
+            or entry is None
+            or is_protected_member(member, is_protected)
+        ):
+            continue
+        if is_config_edited(member, entry):
+            kept.append(member)
+            # Unless the operator made the same change
+            if member in new_index and not matches_entry(member, new_index[member]):
+                conflicts.append(member)
+
+    # Configs the operator created, that the pack now has as well
+    for member in added:
+        if (
+            member.startswith("config/")
+            and os.path.lexists(member)
+            and not is_protected_member(member, is_protected)
+        ):
+            kept.append(member)
+            if not matches_entry(member, new_index[member]):
+                conflicts.append(member)
+
+    return kept, conflicts
+
+
+def write_config_conflicts(file, conflicts):
+    """Write the pack's version of each conflict next to the operator's, as "<config>.new".
+
+    The conflicts are listed in config_conflicts_file, the ".new" files of the
+    previous update are removed.
+    """
+    if os.path.isfile(config_conflicts_file):
+        with open(config_conflicts_file, "r") as f:
+            for line in f:
+                if line.strip():
+                    remove(os.path.normpath(line.strip()) + ".new")
+        remove(config_conflicts_file)
+
+    if not conflicts:
+        return
+
+    with zipfile.ZipFile(file) as zf:
+        for member in conflicts:
+            dst_path = os.path.normpath(member.replace("/", os.path.sep)) + ".new"
+            with zf.open(member) as src, open(dst_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+    with open(config_conflicts_file, "w") as f:
+        for member in conflicts:
+            f.write(member + "\n")
+
+    print(
+        "WARNING:",
+        len(conflicts),
+        "edited configs were changed by the update as well, the new defaults are saved as '<config>.new'.",
+    )
+    print("See", config_conflicts_file)
+    print()
+
+
+def resolve_delta(old_index, new_index, to_update, is_protected):
+    """Decide what a delta update does, shared by apply_delta & plan_update.
+
+    Like a full reinstall, only the updated folders & the configs are replaced.
+    Any other file of the pack is only extracted if it doesn't exist,
+    it is never overwritten nor deleted. Files the pack didn't change, but that
+    are missing, are extracted again.
+    Returns a dictionary with the "added", "changed", "removed", "unchanged" &
+    "missing" members, the members to "delete" & "extract", the members to
+    "preserve", the edited configs that are "kept" and the config "conflicts".
+    """
+    added, changed, removed, unchanged = compute_delta(old_index, new_index)
+    removed += [
+        member
+        for member in find_stray_files(to_update, new_index)
+        if member not in old_index
+    ]
+
+    existing = scan_existing_paths(unchanged)
+    missing = [
+        member
+        for member in unchanged
+        if os.path.normpath(member.replace("/", os.path.sep)) not in existing
+    ]
+
+    kept, conflicts = reconcile_configs(
+        old_index, new_index, added, changed, removed, is_protected
+    )
+    kept_set = set(kept)
+
+    delete = []
+    preserve = []
+    for member in removed + changed:
+        if is_protected_member(member, is_protected) or member in kept_set:
+            preserve.append(member)
+        elif member.startswith("config/") or is_updated_member(member, to_update):
+            delete.append(member)
+    # Whatever is in the way in the updated folders is replaced, e.g. an additional mod
+    delete += [
+        member
+        for member in added
+        if is_updated_member(member, to_update) and os.path.lexists(member)
+    ]
+
+    return {
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "unchanged": unchanged,
+        "missing": missing,
+        "delete": delete,
+        "extract": [member for member in added + changed if member not in kept_set]
+        + missing,
+        "preserve": preserve,
+        "kept": kept,
+        "conflicts": conflicts,
+    }
+
+
+def apply_delta(file, manifest, new_index, protected, to_update):
+    """Only touch the files that changed between the installed and the new update.
+
+    "new_index" is what will be installed from the zip, see resolve_delta.
+    Removed files are deleted, added/changed files are extracted,
+    identical files are left untouched. Protected configs are never replaced,
+    nor are configs the operator edited, see reconcile_configs.
+    Anything else in the updated folders is removed, just like a full reinstall.
+    Returns the edited configs that were kept, and the members that were skipped
+    because they already exist, see extract_game_zip.
+    """
+    is_protected = compile_protected(protected)
+    with timed_phase("config merge"):
+        delta = resolve_delta(manifest["files"], new_index, to_update, is_protected)
+        write_config_conflicts(file, delta["conflicts"])
+
+    print(
+        "Delta update ->",
+        len(delta["added"]),
+        "added,",
+        len(delta["changed"]),
+        "changed,",
+        len(delta["removed"]),
+        "removed,",
+        len(delta["unchanged"]),
+        "unchanged,",
+        len(delta["missing"]),
+        "missing.",
+    )
+
+    # Delete removed & changed files, changed files are extracted again below
+    with timed_phase("old-tree deletion"):
+        for member in delta["delete"]:
+            remove(os.path.normpath(member.replace("/", os.path.sep)))
+            count_phase(files=1)
+        removed = set(delta["removed"])
+        for member in delta["delete"]:
+            if member in removed:
+                remove_empty_parents(os.path.normpath(member.replace("/", os.path.sep)))
+
+    with timed_phase("extraction"):
+        skipped = extract_game_zip(file, members=delta["extract"])
+
+    return delta["kept"], skipped
+
+
+def install_game_zip(file, protected, to_update, exclude=None):
+    """Install the update, either as a delta or as a full reinstall.
+
+    A delta update is used if a previous update left a manifest behind,
+    otherwise the old files are removed and everything is extracted.
+    Members "exclude" returns True for are skipped, see extract_game_zip.
+    """
+    manifest = load_manifest()
+
+    # Forget the previous install, an interrupted update falls back to a full reinstall
+    remove(manifest_file)
+
+    # Only what is installed, so excluded files left by a previous update are removed
+    index = read_zip_index(file)
+    if exclude is not None:
+        index = {
+            member: entry for member, entry in index.items() if not exclude(member)
+        }
+
+    if manifest is not None:
+        kept, skipped = apply_delta(file, manifest, index, protected, to_update)
+    else:
+        # Remove certain config folders
+        with timed_phase("config removal"):
+            remove_configs(protected)
+
+        # Move the old directories and files aside, they are deleted while extracting
+        with timed_phase("old-tree deletion"):
+            for file_name in to_update:
+                move_to_trash(file_name)
+
+        # Extract and update the game
+        with timed_phase("extraction"):
+            skipped = extract_game_zip(file, exclude=exclude)
+        kept = []
+
+    save_manifest(
+        index, kept, manifest["files"] if manifest is not None else None, skipped
+    )
+
+
+def list_files(top_level):
+    """List the files of a folder as zip members, or the file itself."""
+    if os.path.isfile(top_level) or os.path.islink(top_level):
+        return [top_level]
+
+    files = []
+    for root, dirs, names in os.walk(top_level):
+        for name in names:
+            files.append(os.path.join(root, name).replace(os.path.sep, "/"))
+    return files
+
+
+def get_file_size(member):
+    """Get the size of an installed file, 0 if it doesn't exist."""
+    try:
+        return os.lstat(member).st_size
+    except OSError:
+        return 0
+
+
+def plan_update(side, path, zip_file):
+    """Compute what install_game_zip would do to an instance, without doing it.
+
+    Only the central directory of the zip and the metadata of the instance are read,
+    nothing is inflated nor written. Returns a dictionary with the members to
+    "delete", "extract", "skip" & "preserve", the config "conflicts", and the bytes involved.
+    Additional mods, shaders & Java 9+ aren't part of the plan.
+    """
+    zip_file = os.path.abspath(zip_file)
+    script_dir = os.getcwd()
+    os.chdir(path)
+    try:
+        index = read_zip_index(zip_file)
+        exclude = compile_profile(extraction_profile or side)
+        if exclude is not None:
+            index = {
+                member: entry for member, entry in index.items() if not exclude(member)
+            }
+        is_protected = compile_protected(protected_configs[side])
+        manifest = load_manifest()
+
+        delete = []
+        preserve = []
+        conflicts = []
+        if manifest is not None:
+            delta = resolve_delta(
+                manifest["files"], index, update_folders[side], is_protected
+            )
+            delete = [member for member in delta["delete"] if os.path.lexists(member)]
+            preserve = delta["preserve"]
+            conflicts = delta["conflicts"]
+        else:
+            for top_level in update_folders[side]:
+                delete += list_files(top_level)
+            if os.path.isdir("config"):
+                unprotected = []
+                find_unprotected("./config/", ("config",), is_protected, unprotected)
+                unprotected = {
+                    os.path.normpath(member).replace(os.path.sep, "/")
+                    for member in unprotected
+                }
+                for member in list_files("config"):
+                    if member in unprotected:
+                        delete.append(member)
+                    else:
+                        preserve.append(member)
+
+        # Like extract_game_zip, existing files aren't overwritten
+        deleted = set(delete)
+        extract = []
+        skip = []
+        for member in index:
+            if member in deleted or not os.path.lexists(member):
+                extract.append(member)
+            else:
+                skip.append(member)
+
+        plan = {
+            "side": side,
+            "path": os.path.abspath("."),
+            "zip": zip_file,
+            "mode": "delta" if manifest is not None else "full",
+            "delete": delete,
+            "extract": extract,
+            "skip": skip,
+            "preserve": preserve,
+            "conflicts": conflicts,
+            "bytes_to_write": sum(index[member][0] for member in extract),
+            "bytes_to_free": sum(get_file_size(member) for member in delete),
+            "bytes_free": shutil.disk_usage(".").free,
+        }
+    finally:
+        os.chdir(script_dir)
+
+    # Everything is deleted before anything is extracted
+    plan["bytes_needed"] = max(0, plan["bytes_to_write"] - plan["bytes_to_free"])
+    plan["seconds"] = estimate_plan_duration(plan)
+    return plan
+
+
+def estimate_plan_duration(plan):
+    """Estimate how long the plan takes, from the last measured update if there is one."""
+    extract_rate = plan_extract_rate
+    delete_rate = plan_delete_rate
+    try:
+        with open(timings_file or updater_saves_dir + "timings.jsonl", "r") as f:
+            lines = f.readlines()
+        summary = json.loads(lines[-1])["summary"]
+        extraction = summary["extraction"]
+        if extraction["bytes"] and extraction["seconds"]:
+            extract_rate = extraction["bytes"] / extraction["seconds"]
+    except (OSError, ValueError, IndexError, KeyError, TypeError):
+        pass
+
+    return plan["bytes_to_write"] / extract_rate + len(plan["delete"]) / delete_rate
+
+
+def print_plan(plan):
+    """Print a summary of a plan, see plan_update."""
+    mb = 1024 * 1024
+    print("Plan for", plan["path"], "(" + plan["side"] + ", " + plan["mode"] + "):")
+    print("   -> Delete:  ", len(plan["delete"]), "files")
+    print("   -> Extract: ", len(plan["extract"]), "files")
+    print("   -> Skip:    ", len(plan["skip"]), "files, kept as they are")
+    print("   -> Preserve:", len(plan["preserve"]), "protected or edited configs")
+    print("   -> Conflicts:", len(plan["conflicts"]), "edited configs the pack changed")
+    print("   -> Bytes to write: %.1f MB" % (plan["bytes_to_write"] / mb))
+    print("   -> Bytes to free:  %.1f MB" % (plan["bytes_to_free"] / mb))
+    print(
+        "   -> Free space needed: %.1f MB (%.1f MB available)"
+        % (plan["bytes_needed"] / mb, plan["bytes_free"] / mb)
+    )
+    if plan["bytes_needed"] > plan["bytes_free"]:
+        print("WARNING: Not enough free space for the update.")
+    print("   -> Estimated duration: %.0f s" % plan["seconds"])
+
+
+def get_folder_size(folder):
+    """Get the size of every file in a folder, 0 if it doesn't exist."""
+    size = 0
+    for root, dirs, files in os.walk(folder):
+        for name in files:
+            size += get_file_size(os.path.join(root, name))
+    return size
+
+
+def preflight(side, path, zip_file, copied_dirs=()):
+    """Check there is enough free space for the update, before anything is deleted.
+
+    The bytes to extract come from the central directory, see plan_update.
+    Folders copied into the game directory first, e.g. shaders, are added.
+    The space of the old files isn't counted, they are deleted in the background.
+    Exits if there isn't enough space.
+    """
+    check_free_space(path, get_bytes_to_write(side, path, zip_file, copied_dirs))
+
+
+def get_bytes_to_write(side, path, zip_file, copied_dirs=()):
+    """Get the bytes an update writes to the drive of an instance, see preflight."""
+    plan = plan_update(side, path, zip_file)
+
+    # Extracted while downloading, the files are already on the drive and only moved
+    to_write = 0 if pipeline_staging_dir else plan["bytes_to_write"]
+    for folder in copied_dirs:
+        to_write += get_folder_size(folder)
+    return to_write
+
+
+def check_free_space(path, to_write):
+    """Exit if the drive of "path" doesn't have "to_write" bytes free, and a margin."""
+    mb = 1024 * 1024
+    free = shutil.disk_usage(path).free
+    print(
+        "Preflight -> %.1f MB to write, %.1f MB free in %s"
+        % (to_write / mb, free / mb, os.path.abspath(path))
+    )
+    print()
+    if to_write + preflight_margin > free:
+        print("ERROR: Not enough free space for the update, nothing has been changed.")
+        print(
+            "Free up at least %.1f MB, or skip this check with --skip-preflight."
+            % ((to_write + preflight_margin - free) / mb)
+        )
+        exit()
+
+
+def find_local_zip():
+    """Find the zip to plan with, without downloading anything.
+
+    Either given with "--zip=<file>", or the only zip in the current directory.
+    """
+    zip_file = get_option("zip")
+    if zip_file is None:
+        zips = [file for file in os.listdir(".") if file.endswith(".zip")]
+        if len(zips) != 1:
+            print(
+                "ERROR: Expected one zip file in the current directory, use --zip=<file>."
+            )
+            exit()
+        zip_file = zips[0]
+
+    if not os.path.isfile(zip_file):
+        print("ERROR: Zip file doesn't exist ->", zip_file)
+        exit()
+
+    return zip_file
+
+
+def get_side_paths():
+    """Get the side & instances of e.g. "python main.py plan <client/server> [paths]".
+
+    The paths default to the saved path of the side.
+    """
+    side = sys.argv[2] if len(sys.argv) > 2 else ""
+    if side not in ("client", "server"):
+        print("ERROR: Use '" + arg + " client' or '" + arg + " server'.")
+        exit()
+
+    paths = [option for option in sys.argv[3:] if not option.startswith("--")]
+    if not paths:
+        path_file = updater_saves_dir + (
+            "gamepath.txt" if side == "client" else "serverpath.txt"
+        )
+        if not os.path.isfile(path_file):
+            print("ERROR: No path given, and", path_file, "doesn't exist.")
+            exit()
+        with open(path_file, "r") as f:
+            paths = [f.readline()]
+
+    for path in paths:
+        if not os.path.isdir(path):
+            print("ERROR: Path doesn't exist ->", path)
+            exit()
+
+    return side, paths
+
+
+def plan_updates():
+    """Print what updating the instances would do, "python main.py plan <client/server> [paths]".
+
+    Use "--json" for every member of the plans.
+    """
+    side, paths = get_side_paths()
+    zip_file = find_local_zip()
+    plans = [plan_update(side, path, zip_file) for path in paths]
+
+    if "--json" in sys.argv[2:]:
+        print(json.dumps(plans, indent=2))
+        return
+
+    for plan in plans:
+        print_plan(plan)
+        print()
+
+
+def verify_instance(side, path, full=False):
+    """Check the installed files of an instance against its manifest.
+
+    Files with the size & mtime of the manifest are assumed intact, unless "full".
+    The others are checksummed in parallel, and the mtime of intact ones is saved
+    so the next run skips them. Configs are the operator's, see reconcile_configs,
+    they aren't checked.
+    Returns the manifest and the members that are missing or corrupt.
+    """
+    script_dir = os.getcwd()
+    os.chdir(path)
+    try:
+        manifest = load_manifest()
+        if manifest is None:
+            print("ERROR: No manifest in", path, "-> Update it once first.")
+            exit()
+
+        files = manifest["files"]
+        missing = []
+        corrupt = []
+        to_check = []
+        for member, entry in files.items():
+            if member.startswith("config/"):
+                continue
+            try:
+                stat = os.stat(member)
+            except OSError:
+                missing.append(member)
+                continue
+            if stat.st_size != entry[0]:
+                corrupt.append(member)
+            elif full or len(entry) < 3 or stat.st_mtime_ns != entry[2]:
+                to_check.append(member)
+
+        # Zlib releases the GIL, the checksums run in parallel
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=extract_workers
+        ) as executor:
+            crcs = list(executor.map(file_crc32, to_check))
+
+        for member, crc in zip(to_check, crcs):
+            if crc != files[member][1]:
+                corrupt.append(member)
+            else:
+                files[member] = files[member][:2] + [get_mtime(member)]
+        if to_check:
+            write_manifest(manifest)
+    finally:
+        os.chdir(script_dir)
+
+    print("Verified", os.path.abspath(path) + ":")
+    print("   -> Checksummed:", len(to_check), "of", len(files), "files")
+    print("   -> Missing:", len(missing))
+    print("   -> Corrupt:", len(corrupt))
+    return manifest, missing + corrupt
+
+
+def find_repair_zip(path):
+    """Find the zip of the installed update, to repair an instance with.
+
+    Either given with "--zip=<file>", the zip named in the installed record, or find_local_zip.
+    """
+    if get_option("zip") is None:
+        try:
+            with open(os.path.join(path, installed_file), "r") as f:
+                zip_file = json.load(f)["zip"]
+            if os.path.isfile(zip_file):
+                return os.path.abspath(zip_file)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    return os.path.abspath(find_local_zip())
+
+
+def repair_instance(path, manifest, broken, zip_file):
+    """Extract the broken members of an instance again, returns those that couldn't be."""
+    files = manifest["files"]
+    index = read_zip_index(zip_file)
+    wrong = [member for member in broken if index.get(member) != files[member][:2]]
+    if wrong:
+        print("ERROR: The zip isn't the installed update ->", zip_file)
+        return broken
+
+    script_dir = os.getcwd()
+    os.chdir(path)
+    try:
+        # A corrupt file may be a hardlink of the store, inflate it again
+        hashes = load_pack_index(zip_file).get("hashes", {})
+        stored = [
+            member for member in broken if member.casefold().endswith(store_extensions)
+        ]
+        entries = find_store_entries(
+            [os.path.normpath(member.replace("/", os.path.sep)) for member in stored]
+        )
+        entries += [store_path(hashes[member]) for member in stored if member in hashes]
+
+        for member in broken:
+            remove(os.path.normpath(member.replace("/", os.path.sep)))
+        for entry in entries:
+            remove(entry)
+
+        extract_game_zip(zip_file, members=broken)
+
+        for member in broken:
+            files[member] = files[member][:2] + [get_mtime(member)]
+        write_manifest(manifest)
+    finally:
+        os.chdir(script_dir)
+
+    print("   -> Repaired:", len(broken))
+    return []
+
+
+def verify_instances():
+    """Verify instances, "python main.py verify <client/server> [paths]".
+
+    Use "--repair" to extract missing & corrupt files again, and "--full" to checksum every file.
+    Returns the number of instances that are still broken.
+    """
+    side, paths = get_side_paths()
+    repair = "--repair" in sys.argv[2:]
+    full = "--full" in sys.argv[2:]
+
+    # The zip is only read, never removed
+    global keep_zip_file, max_progress
+    keep_zip_file = True
+    max_progress = "2"
+
+    failed = 0
+    for path in paths:
+        manifest, broken = verify_instance(side, path, full)
+        if broken and repair:
+            broken = repair_instance(path, manifest, broken, find_repair_zip(path))
+        if broken:
+            failed += 1
+        print()
+
+    return failed
+
 
 def check_shaders():
     """Check if the user wants shaders or not. Remembers the answer."""
@@ -586,146 +3088,133 @@ def check_script_updater():
     else:
         with open(auto_update_file, "r") as f:
             auto_update_answer = f.readline()
-            if auto_update_answer == "y":
+        # Only pull the script if there is a new commit
+        if auto_update_answer == "y":
+            if is_script_outdated():
                 update_script()
+            else:
+                print("NOTE: The script is already up-to-date.")
+                print()
 
 
 def update_client(path, file_name, shader_answer):
     """TODO: add comment"""
-    # NOTE: Don't include "config", it is handled further down
-    to_update = [
-        "mods",
-        "resourcepacks",
-        "resources",
-        "scripts",
-        "README.md",
-    ]
+    to_update = update_folders["client"]
+    additional_mods_dir = updater_files_dir + "additional-mods-client"
+    shaders_dir = updater_files_dir + "shaders"
+
+    # Make sure the update fits on the drive, before anything is touched
+    if not skip_preflight:
+        with timed_phase("preflight"):
+            preflight(
+                "client",
+                path,
+                file_name,
+                [additional_mods_dir] + ([shaders_dir] if shader_answer == "y" else []),
+            )
+
+    # Start downloading Java 9+ now, it is done by the time the update is installed
+    if java_9_answer == "y":
+        java_9_downloads = prefetch_java_9()
 
     # Move additional mods, if any, to the game folder
     print("Searching for additional mods...", total_progress())
-    additional_mods_dir = updater_files_dir + "additional-mods-client"
-    copy_dir_to_game(additional_mods_dir, path)
+    with timed_phase("additional mods"):
+        copy_dir_to_game(additional_mods_dir, path)
 
     # Move shaders folder, if user choose so
-    shaders_dir = updater_files_dir + "shaders"
     if shader_answer == "y":
         print("Installing shaders...", total_progress())
-        copy_dir_to_game(shaders_dir, path)
+        with timed_phase("shaders"):
+            copy_dir_to_game(shaders_dir, path)
 
     # Move into the client directory
     os.chdir(path)
+    installed_record = os.path.abspath(installed_file)
 
-    # Remove certain config folders
-    protected = [
-        "GregTech/GregTech.cfg",
-        "NEI/",
-        "betterquesting.cfg",
-        "InvTweaks.cfg",
-        "InGameInfoXML.cfg",
-    ]
-    remove_configs(protected)
-
-    # Remove the old directories and files
-    for file in to_update:
-        remove(file)
+    # Protect certain config folders
+    protected = protected_configs["client"]
 
-    # Extract and update the game
-    extract_game_zip(file_name)
+    # Remove the old files and extract the update, or only apply what changed
+    exclude = compile_profile(extraction_profile or "client")
+    install_game_zip(file_name, protected, to_update, exclude)
 
     # Add the additional mods to the mod folder
     mods_dir = "./mods/"
-    add_dir_to_game(additional_mods_dir, mods_dir)
+    with timed_phase("additional mods"):
+        add_dir_to_game(additional_mods_dir, mods_dir)
 
     # Add shaders & configs
     if shader_answer == "y":
-        add_shaders_to_game(shaders_dir)
+        with timed_phase("shaders"):
+            add_shaders_to_game(shaders_dir)
 
     # Apply Java 9+ if the user has choosen so
-    if java_9_answer == "y":
-        print("Applying Java 9+...", total_progress())
-        add_java_9_to_game(mods_dir)
-    else:
-        remove_java_9_from_game()
+    with timed_phase("Java 9+"):
+        if java_9_answer == "y":
+            print("Applying Java 9+...", total_progress())
+            add_java_9_to_game(mods_dir, java_9_downloads)
+        else:
+            remove_java_9_from_game()
+
+    # The old files are deleted in the background, wait for them
+    with timed_phase("trash cleanup"):
+        empty_trash()
+
+    save_installed_record(installed_record, file_name, shader_answer)
 
 
 def update_server(path, file_name):
     """TODO: add comment"""
-    # NOTE: Don't include "config", it is handled further down
-    dirs_to_update = [
-        "mods",
-        "resourcepacks",
-        "resources",
-        "scripts",
-    ]
+    dirs_to_update = update_folders["server"]
+    additional_mods_dir = updater_files_dir + "additional-mods-server"
 
-    # See: https://gtnh.miraheze.org/wiki/Client-side_Mods
-    client_side_mods = [
-        "BeeBetterAtBees",
-        "BetterAchievements",
-        "Controlling",
-        "CustomMainMenu",
-        "DefaultWorldGenerator",
-        "IC2+Crop+Plugin",
-        "InGameInfoXML",
-        "MouseTweaks",
-        "NettyPatch",
-        "OptiFine",
-        "ResourceLoader",
-        "bettercrashes",
-        "betterloadingscreen",
-        "boubs-admin-tools",
-        "craftpresence",
-        "defaultserverlist",
-        "fastcraft",
-        "inventorytweaks",
-        "itlt",
-        "journeymap-",
-        "oauth",
-        "overloadedarmorbar",
-        "torohealth",
-    ]
+    # Make sure the update fits on the drive, before anything is touched
+    if not skip_preflight:
+        with timed_phase("preflight"):
+            preflight("server", path, file_name, [additional_mods_dir])
+
+    # Start downloading Java 9+ now, it is done by the time the update is installed
+    java_9_downloads = prefetch_java_9()
 
     # Move additional mods, if any, to the server folder
     print("Searching for additional mods...", total_progress())
-    additional_mods_dir = updater_files_dir + "additional-mods-server"
-    copy_dir_to_game(additional_mods_dir, path)
+    with timed_phase("additional mods"):
+        copy_dir_to_game(additional_mods_dir, path)
 
     # Move into the server directory
     os.chdir(path)
+    installed_record = os.path.abspath(installed_file)
 
-    # Remove certain config folders
-    protected = [
-        "GregTech/GregTech.cfg",
-        "aroma1997/",
-        "JourneyMapServer/",
-        "Morpheus.cfg",
-    ]
-    remove_configs(protected)
+    # Protect certain config folders
+    protected = protected_configs["server"]
 
-    # Remove the old directories except config
-    for dir in dirs_to_update:
-        remove(dir)
+    # Client-side mods, and anything else the server doesn't use, are never extracted
+    exclude = compile_profile(extraction_profile or "server")
 
-    # Extract the new files
-    extract_game_zip(file_name)
+    # Remove the old directories except config and extract the new files,
+    # or only apply what changed since the previous update
+    install_game_zip(file_name, protected, dirs_to_update, exclude)
 
-    # Remove client-side mods
     mods_dir = "./mods/"
-    mods = os.listdir(mods_dir)
-    for mod in mods:
-        for client_mod in client_side_mods:
-            if mod.casefold().startswith(client_mod.casefold()):
-                remove(os.path.join(mods_dir, mod))
 
     # Add the server version of "JourneyMap", and other additional mods
     # NOTE: Check the version of this mod every "server-pack" update
-    add_dir_to_game(additional_mods_dir, mods_dir)
+    with timed_phase("additional mods"):
+        add_dir_to_game(additional_mods_dir, mods_dir)
 
     # Apply Java 9+ to the server
     # NOTE: Always default to Java 9+ for servers. This is because a
     #       Java 9+ server allows all clients to join, despite Java version.
     print("Applying Java 9+...", total_progress())
-    add_java_9_to_game(mods_dir)
+    with timed_phase("Java 9+"):
+        add_java_9_to_game(mods_dir, java_9_downloads)
+
+    # The old files are deleted in the background, wait for them
+    with timed_phase("trash cleanup"):
+        empty_trash()
+
+    save_installed_record(installed_record, file_name, "n")
 
 
 def update_script():
@@ -747,6 +3236,7 @@ def update_script():
         "./files/additional-mods-client",
         "./files/additional-mods-server",
         "./files/shaders",
+        "./benchmark.py",
     ]
 
     # Loop through every file and folder in the current directory
@@ -756,10 +3246,12 @@ def update_script():
             if path in to_remove:
                 remove(path)
 
-    # Download latest version
-    urllib.request.urlretrieve(
+    # Download latest version, remember the commit so it isn't pulled again
+    latest_commit = get_script_commit()
+    download_file(
         "https://github.com/flyslime/gtnh-updater/archive/refs/heads/main.zip",
         zip_name,
+        validate_zip=True,
     )
 
     # Extract the zip file
@@ -773,13 +3265,359 @@ def update_script():
     remove(zip_name)
     remove(github_file_name)
 
+    save_script_commit(latest_commit)
+
+
+def get_staged_entries(path, zip_file):
+    """Get the top-level files & folders of a server that an update may write to.
+
+    The top-levels of the pack, the folders we update, and what was added on top of the pack.
+    """
+    index = load_pack_index(zip_file)
+    names = set(index["tree"]) | {name.split("/", 1)[0] for name in index["dirs"]}
+    names.update(["config", "mods", "resourcepacks", "resources", "scripts"])
+
+    # E.g. the forge patches of lwjgl3ify, next to the server
+    try:
+        with open(os.path.join(path, artifacts_file), "r") as f:
+            artifacts = json.load(f)
+        for component in artifacts.values():
+            for file in component.get("files", {}):
+                names.add(os.path.normpath(file).split(os.path.sep, 1)[0])
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    names.discard(os.path.normpath(instance_saves_dir))
+    return sorted(name for name in names if name not in ("", ".", ".."))
+
+
+def prepare_staging(path, staging, zip_file):
+    """Create the staging folder of a server, with hardlinks of what the update may write to.
+
+    Hardlinks are instant, and configs written by the running server end up in both.
+    Files of the pack that already exist are skipped by the extraction, like in the server.
+    The records of the previous update are copied, the update rewrites them.
+    """
+    remove(staging)
+    os.makedirs(staging)
+
+    for state_file in instance_state_files:
+        src = os.path.join(path, state_file)
+        if os.path.isfile(src):
+            dst = os.path.join(staging, state_file)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            copy_file(src, dst)
+
+    for name in get_staged_entries(path, zip_file):
+        src = os.path.join(path, name)
+        dst = os.path.join(staging, name)
+        if os.path.isdir(src) and not os.path.islink(src):
+            shutil.copytree(src, dst, symlinks=True, copy_function=link_or_copy)
+        elif os.path.islink(src):
+            os.symlink(os.readlink(src), dst)
+        elif os.path.isfile(src):
+            link_or_copy(src, dst)
+
+
+def update_server_staged(path, zip_file):
+    """Update a server in "<path>.staging", while the server keeps running."""
+    path = os.path.abspath(path)
+    staging = path + ".staging"
+
+    print("Preparing", staging, "...")
+    print()
+    prepare_staging(path, staging, zip_file)
+    update_server(staging, zip_file)
+
+
+def is_same_entry(staged, live):
+    """Check if a staged file/folder is still the hardlink of the live one, i.e. the update left it alone."""
+    if os.path.islink(staged) or os.path.islink(live):
+        return (
+            os.path.islink(staged)
+            and os.path.islink(live)
+            and os.readlink(staged) == os.readlink(live)
+        )
+    if os.path.isdir(staged) or os.path.isdir(live):
+        if not (os.path.isdir(staged) and os.path.isdir(live)):
+            return False
+        names = os.listdir(staged)
+        if set(names) != set(os.listdir(live)):
+            return False
+        return all(
+            is_same_entry(os.path.join(staged, name), os.path.join(live, name))
+            for name in names
+        )
+    return os.path.samefile(staged, live)
+
+
+def swap_staged_update(path):
+    """Swap the staged update into the server, only a handful of renames.
+
+    Only the files & folders the update replaced are swapped, the old ones are moved
+    to "<path>.previous" and kept until the operator confirms the swap, see confirm_swap.
+    """
+    path = os.path.abspath(path)
+    staging = path + ".staging"
+    backup = path + ".previous"
+    if not os.path.isdir(staging):
+        print("ERROR: No staged update found ->", staging)
+        exit()
+    if os.path.lexists(backup):
+        print("ERROR: The files of the previous swap are still in", backup)
+        print(
+            "       Check the server, then remove them with 'python main.py swap --confirm'."
+        )
+        exit()
+
+    # We can't remove the staging folder while we are in it
+    os.chdir(path)
+
+    os.makedirs(backup)
+    swapped = []
+    saves_dir = os.path.normpath(instance_saves_dir)
+    for name in sorted(os.listdir(staging)):
+        staged = os.path.join(staging, name)
+        live = os.path.join(path, name)
+        if name == saves_dir:
+            continue
+        if os.path.lexists(live):
+            if is_same_entry(staged, live):
+                continue
+            os.rename(live, os.path.join(backup, name))
+        os.rename(staged, live)
+        swapped.append(name)
+
+    # The records of the update, the log & the trash of the server stay where they are
+    for state_file in instance_state_files:
+        staged = os.path.join(staging, state_file)
+        if not os.path.isfile(staged):
+            continue
+        live = os.path.join(path, state_file)
+        if os.path.lexists(live):
+            os.makedirs(os.path.join(backup, saves_dir), exist_ok=True)
+            os.rename(live, os.path.join(backup, state_file))
+        os.makedirs(os.path.dirname(live), exist_ok=True)
+        os.rename(staged, live)
+
+    # Only hardlinks of the live files are left
+    remove(staging)
+
+    print(
+        "   -> Swapped:", path, "(" + (", ".join(swapped) or "only the records") + ")"
+    )
+    print("   -> The old files are kept in", backup)
+
+
+def confirm_swap(path):
+    """Remove the files a swap replaced, once the operator checked the server."""
+    backup = os.path.abspath(path) + ".previous"
+    if not os.path.lexists(backup):
+        print("   -> Nothing to confirm:", path)
+        return
+
+    remove(backup)
+    print("   -> Confirmed:", path)
+
+
+def get_swap_paths(path_file):
+    """Get the servers to swap, given as arguments or the saved server path."""
+    paths = [option for option in sys.argv[2:] if not option.startswith("--")]
+    if paths:
+        return paths
+
+    if not os.path.exists(path_file):
+        print("ERROR: No servers given, and", path_file, "doesn't exist.")
+        exit()
+
+    with open(path_file, "r") as f:
+        return [f.readline()]
+
+
+def get_option(name, default=None):
+    """Get the value of an optional flag, e.g. "--jobs=4"."""
+    for option in sys.argv[2:]:
+        if option.startswith("--" + name + "="):
+            return option.split("=", 1)[1]
+    return default
+
+
+def update_server_instance(
+    path,
+    zip_file,
+    version,
+    workers,
+    staged=False,
+    profile="",
+    timings=(False, ""),
+    skip_checks=False,
+):
+    """Update one server of a batch, runs in its own process.
+
+    Everything is written to ".gtnh-updater/update.log" in the server directory.
+    Returns the exit status, 0 if the update succeeded.
+    """
+    global arg, gtnh_version, keep_zip_file, extract_workers, progress_bar
+    global extraction_profile, phase_timings, show_timings, timings_file
+    global skip_preflight
+    arg = "server"
+    skip_preflight = skip_checks
+    extraction_profile = profile
+    phase_timings = []
+    show_timings, timings_file = timings
+    gtnh_version = version
+    keep_zip_file = True
+    extract_workers = workers
+    progress_bar = 0
+
+    # The process is reused for the next server, which expects the script directory
+    script_dir = os.getcwd()
+
+    log_file = os.path.join(path, instance_saves_dir, "update.log")
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    status = 0
+    with open(log_file, "w") as log, contextlib.redirect_stdout(
+        log
+    ), contextlib.redirect_stderr(log):
+        try:
+            if staged:
+                update_server_staged(path, zip_file)
+            else:
+                update_server(path, zip_file)
+            print()
+            print("UPDATE COMPLETE!")
+            if show_timings:
+                print()
+                print_timings()
+            write_timings(path)
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) and e.code else 1
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        finally:
+            os.chdir(script_dir)
+
+    return status
+
+
+def get_batch_paths():
+    """Get the servers to update, given as arguments or saved in "serverpaths.txt"."""
+    paths = [option for option in sys.argv[2:] if not option.startswith("--")]
+    if paths:
+        return paths
+
+    batch_paths_file = updater_saves_dir + "serverpaths.txt"
+    if not os.path.exists(batch_paths_file):
+        print("ERROR: No servers given, and", batch_paths_file, "doesn't exist.")
+        print()
+        print("For example:")
+        print("> python main.py batch ../server-1 ../server-2")
+        exit()
+
+    with open(batch_paths_file, "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def batch_preflight(paths, zip_file, copied_dirs=()):
+    """Check the free space for a batch of servers, before any of them is updated.
+
+    The bytes to write are added up per drive, as the servers are updated at the same time.
+    A staged update is written next to the server. Exits if a drive doesn't have enough space.
+    """
+    # "device" -> [first path on it, bytes to write]
+    drives = {}
+    for path in paths:
+        target = os.path.dirname(path) if staged_update else path
+        to_write = get_bytes_to_write("server", path, zip_file, copied_dirs)
+        drive = drives.setdefault(os.stat(target).st_dev, [target, 0])
+        drive[1] += to_write
+
+    for target, to_write in drives.values():
+        check_free_space(target, to_write)
+
+
+def update_servers(paths):
+    """Update several servers at once, from a single zip file.
+
+    The zip is downloaded/found once, and every server is updated in its own process.
+    Returns the number of servers that failed.
+    """
+    paths = [os.path.abspath(path) for path in paths]
+    for path in paths:
+        if not os.path.isdir(path):
+            print("ERROR: Path doesn't exist ->", path)
+            exit()
+
+    jobs = get_option("jobs", str(min(len(paths), os.cpu_count() or 1)))
+    if not jobs.isdigit() or int(jobs) < 1:
+        print("ERROR: Invalid number of jobs ->", jobs)
+        exit()
+    jobs = int(jobs)
+
+    # Extract straight from the zip, it is shared by every server
+    zip_file = os.path.abspath(find_zip_file(""))
+    print("GregTech zip has been found...", total_progress())
+    print()
+
+    # Every server fits on its own, but maybe not all of them together
+    if not skip_preflight:
+        batch_preflight(paths, zip_file, [updater_files_dir + "additional-mods-server"])
+
+    # Download Java 9+ once, every server finds it in the cache
+    print("Downloading Java 9+...")
+    try:
+        download_java_9("server")
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        print("   -> Failed (" + str(e) + "), every server tries again.")
+    print()
+
+    workers = max(1, (os.cpu_count() or 1) // jobs)
+    print("Updating", len(paths), "servers,", jobs, "at a time...")
+    print()
+
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                update_server_instance,
+                path,
+                zip_file,
+                gtnh_version,
+                workers,
+                staged_update,
+                extraction_profile,
+                (show_timings, timings_file),
+                True,
+            ): path
+            for path in paths
+        }
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                status = future.result()
+            except Exception as e:
+                print("   ->", e)
+                status = 1
+
+            if status == 0:
+                print("   -> OK:", path)
+            else:
+                failed += 1
+                print("   -> FAILED:", path)
+                print("      See", os.path.join(path, instance_saves_dir, "update.log"))
+
+    return failed
+
 
 def main():
     # Check for invalid arguments
     try:
         sys.argv[1]
     except:
-        print("ERROR: No arguments given. Use 'client', 'server', or 'script'.")
+        print(
+            "ERROR: No arguments given. Use 'client', 'server', 'script', 'launch', 'batch', 'swap', 'plan', or 'verify'."
+        )
         print()
         print("For example:")
         print("> python main.py client")
@@ -789,6 +3627,49 @@ def main():
     global arg
     arg = sys.argv[1]
 
+    # Pre-launch command of the launcher, nothing to do if already up-to-date
+    if arg == "launch":
+        if is_launch_current():
+            print("NOTE: GT New Horizons is already up-to-date, launching...")
+            return
+        arg = "client"
+
+    # Optional flags, e.g. "python main.py client --pipeline"
+    global pipeline_download, staged_update
+    staged_update = "--staged" in sys.argv[2:] and arg in ("server", "batch")
+    pipeline_download = "--pipeline" in sys.argv[2:] and arg != "batch"
+    pipeline_download = pipeline_download and not staged_update
+
+    global extraction_profile
+    extraction_profile = get_option("extract", "")
+    if extraction_profile and extraction_profile not in extraction_profiles:
+        print("ERROR: Unknown extraction profile. Use:", ", ".join(extraction_profiles))
+        exit()
+
+    # Absolute, as we move into the game directory
+    global show_timings, timings_file, skip_preflight
+    show_timings = "--timings" in sys.argv[2:]
+    skip_preflight = "--skip-preflight" in sys.argv[2:]
+    if "--report" in sys.argv[2:]:
+        timings_file = os.path.abspath(updater_saves_dir + "timings.jsonl")
+    elif get_option("report"):
+        timings_file = os.path.abspath(get_option("report"))
+
+    # Dry-run, only reads the zip and the instances
+    if arg == "plan":
+        plan_updates()
+        return
+
+    if arg == "verify":
+        failed = verify_instances()
+        if failed:
+            print("ERROR:", failed, "instance(s) have missing or corrupt files.")
+            if "--repair" not in sys.argv[2:]:
+                print("=> Run again with --repair to fix them.")
+            exit(1)
+        print("VERIFY COMPLETE!")
+        return
+
     # Create "./files/saves/" if it doesn't exist, as we save the user's data there
     if not os.path.exists(updater_saves_dir):
         os.makedirs(updater_saves_dir)
@@ -813,16 +3694,75 @@ def main():
 
     elif arg == "server":
         path = get_game_path(server_path, "server")
-        zip_file = get_zip_file(server_path, path)
-        update_server(path, zip_file)
+        if staged_update:
+            # Extract straight from the zip, the server directory isn't touched
+            global keep_zip_file
+            keep_zip_file = True
+            zip_file = os.path.abspath(find_zip_file(""))
+            print("GregTech zip has been found...", total_progress())
+            update_server_staged(path, zip_file)
+        else:
+            zip_file = get_zip_file(server_path, path)
+            update_server(path, zip_file)
 
     elif arg == "script":
         update_script()
 
+    elif arg == "batch":
+        failed = update_servers(get_batch_paths())
+        prune_store()
+        print()
+        if failed:
+            print("ERROR:", failed, "server(s) failed to update.")
+            exit(1)
+        if staged_update:
+            print("STAGED UPDATE COMPLETE!")
+            print("=> Stop the servers, then run: python main.py swap <paths>")
+            return
+        print("UPDATE COMPLETE!")
+        print("=> GT New Horizons servers have successfully been updated.")
+        return
+
+    elif arg == "swap":
+        if "--confirm" in sys.argv[2:]:
+            print("Removing the files the swaps replaced...")
+            for path in get_swap_paths(server_path):
+                confirm_swap(path)
+            prune_store()
+            print()
+            print("SWAP CONFIRMED!")
+            return
+
+        print("Swapping the staged updates into place...")
+        for path in get_swap_paths(server_path):
+            swap_staged_update(path)
+        print()
+        print("SWAP COMPLETE!")
+        print("=> Start the server(s) again.")
+        print(
+            "=> Once they run fine, run 'python main.py swap --confirm' to remove the old files."
+        )
+        return
+
     else:
         print("ERROR: Invalid argument.")
         exit()
 
+    # Remove jars from the store that no instance uses anymore
+    if arg in ("client", "server"):
+        prune_store()
+
+        if show_timings:
+            print()
+            print_timings()
+        write_timings(path)
+
+    if staged_update:
+        print()
+        print("STAGED UPDATE COMPLETE!")
+        print("=> Stop the server, then run: python main.py swap")
+        return
+
     print()
     print("UPDATE COMPLETE!")
     print("=> GT New Horizons", arg, "has successfully been updated.")
@@ -832,4 +3772,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # Profile the whole run, nothing is traced otherwise
+    if "--profile" in sys.argv[2:]:
+        profile_main()
+    else:
+        main()
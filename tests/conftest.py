@@ -0,0 +1,131 @@
+import http.server
+import os
+import sys
+import threading
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+
+@pytest.fixture
+def instance(tmp_path, monkeypatch):
+    """An empty server directory to update, the script's own files are kept in "tmp_path"."""
+    monkeypatch.setattr(main, "arg", "server")
+    monkeypatch.setattr(main, "gtnh_version", "2.4.0")
+    monkeypatch.setattr(main, "keep_zip_file", True)
+    monkeypatch.setattr(main, "extraction_profile", "")
+    monkeypatch.setattr(main, "store_dir", str(tmp_path / "store"))
+    monkeypatch.setattr(main, "store_supported", {})
+    monkeypatch.setattr(main, "pack_index_dir", str(tmp_path / "packs"))
+    monkeypatch.setattr(main, "pack_indexes", {})
+    monkeypatch.setattr(main, "java_9_cache_dir", str(tmp_path / "lwjgl3ify"))
+    monkeypatch.setattr(main, "phase_timings", [])
+
+    path = tmp_path / "server"
+    path.mkdir()
+    monkeypatch.chdir(path)
+    return path
+
+
+@pytest.fixture
+def make_pack(tmp_path):
+    """Write a pack zip of "member" -> text, outside of the instance."""
+
+    def make_pack(name, files):
+        zip_file = str(tmp_path / name)
+        with zipfile.ZipFile(zip_file, "w", zipfile.ZIP_DEFLATED) as zf:
+            for member, data in files.items():
+                zf.writestr(member, data)
+        return zip_file
+
+    return make_pack
+
+
+@pytest.fixture
+def install(instance):
+    """Install a pack into the instance, like update_server does."""
+
+    def install(zip_file):
+        os.chdir(instance)
+        main.install_game_zip(
+            zip_file,
+            main.protected_configs["server"],
+            main.update_folders["server"],
+            main.compile_profile("server"),
+        )
+        main.empty_trash()
+
+    return install
+
+
+def read(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+class FileHandler(http.server.BaseHTTPRequestHandler):
+    """Serve "server.files", with ranges unless "server.ranges" is False.
+
+    "server.cut_after" bytes of the next response are sent, then the connection is closed.
+    """
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get("Range")))
+        data = server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header and server.ranges:
+            start = int(range_header[len("bytes=") :].split("-")[0])
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */" + str(len(data)))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header(
+                "Content-Range",
+                "bytes %d-%d/%d" % (start, len(data) - 1, len(data)),
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+
+        body = data[start:]
+        if server.cut_after is not None:
+            body = body[: server.cut_after]
+            server.cut_after = None
+            self.close_connection = True
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server(monkeypatch):
+    """A local HTTP server, its "url" serves the bytes in "files" by path."""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FileHandler)
+    server.files = {}
+    server.ranges = True
+    server.cut_after = None
+    server.requests = []
+    server.url = "http://127.0.0.1:%d" % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+
+    # Retry right away
+    monkeypatch.setattr(main.time, "sleep", lambda seconds: None)
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,51 @@
+import sys
+
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize("jobs", ["0", "abc", "-1", ""])
+def test_batch_rejects_invalid_jobs(jobs, instance, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["main.py", "batch", "--jobs=" + jobs])
+
+    def find_zip_file(path):
+        raise AssertionError("the zip is looked for")
+
+    monkeypatch.setattr(main, "find_zip_file", find_zip_file)
+    with pytest.raises(SystemExit):
+        main.update_servers([str(instance)])
+    assert "ERROR: Invalid number of jobs" in capsys.readouterr().out
+
+
+def test_batch_checks_the_space_of_every_server_on_a_drive(
+    tmp_path, instance, make_pack, monkeypatch, capsys
+):
+    zip_file = make_pack(
+        "GT_New_Horizons_2.4.0_Server_Java_8.zip", {"mods/a.jar": "a" * 1000}
+    )
+    paths = []
+    for name in ("one", "two"):
+        path = tmp_path / name
+        path.mkdir()
+        paths.append(str(path))
+
+    # Enough for one server, not for both
+    margin = main.preflight_margin
+    usage = main.shutil.disk_usage(str(tmp_path))
+    monkeypatch.setattr(
+        main.shutil,
+        "disk_usage",
+        lambda path: usage._replace(free=margin + 1500),
+    )
+    monkeypatch.setattr(sys, "argv", ["main.py", "batch"])
+    monkeypatch.setattr(main, "find_zip_file", lambda path: zip_file)
+
+    def download_java_9(side):
+        raise AssertionError("the batch started")
+
+    monkeypatch.setattr(main, "download_java_9", download_java_9)
+    main.batch_preflight(paths[:1], zip_file)
+    with pytest.raises(SystemExit):
+        main.update_servers(paths)
+    assert "ERROR: Not enough free space" in capsys.readouterr().out
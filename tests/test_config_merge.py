@@ -0,0 +1,96 @@
+import os
+
+import main
+from conftest import read
+
+PACK_V1 = {
+    "mods/a.jar": "a",
+    "config/unedited.cfg": "pack=1",
+    "config/edited.cfg": "pack=1",
+    "config/conflict.cfg": "pack=1",
+    "config/same.cfg": "pack=1",
+    "config/removed.cfg": "pack=1",
+    "config/removed-edited.cfg": "pack=1",
+    "config/GregTech/GregTech.cfg": "pack=1",
+}
+PACK_V2 = {
+    "mods/a.jar": "a",
+    "config/unedited.cfg": "pack=2",
+    "config/edited.cfg": "pack=1",
+    "config/conflict.cfg": "pack=2",
+    "config/same.cfg": "pack=2",
+    "config/added.cfg": "pack=2",
+    "config/GregTech/GregTech.cfg": "pack=2",
+}
+
+
+def edit(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def update(make_pack, install):
+    install(make_pack("v1.zip", PACK_V1))
+    edit("config/edited.cfg", "mine=1")
+    edit("config/conflict.cfg", "mine=1")
+    edit("config/same.cfg", "pack=2")
+    edit("config/removed-edited.cfg", "mine=1")
+    edit("config/added.cfg", "mine=1")
+    edit("config/GregTech/GregTech.cfg", "mine=1")
+    edit("config/own.cfg", "mine=1")
+
+    zip_file = make_pack("v2.zip", PACK_V2)
+    plan = main.plan_update("server", ".", zip_file)
+    install(zip_file)
+    return plan
+
+
+def test_unedited_configs_are_updated(instance, make_pack, install):
+    update(make_pack, install)
+    assert read("config/unedited.cfg") == "pack=2"
+    assert not os.path.exists("config/removed.cfg")
+
+
+def test_edited_configs_are_kept(instance, make_pack, install):
+    update(make_pack, install)
+    assert read("config/edited.cfg") == "mine=1"
+    assert read("config/removed-edited.cfg") == "mine=1"
+    assert read("config/own.cfg") == "mine=1"
+    assert read("config/same.cfg") == "pack=2"
+
+
+def test_protected_configs_are_never_replaced(instance, make_pack, install):
+    update(make_pack, install)
+    assert read("config/GregTech/GregTech.cfg") == "mine=1"
+    assert not os.path.exists("config/GregTech/GregTech.cfg.new")
+
+
+def test_conflicts_are_saved_next_to_the_config(instance, make_pack, install):
+    plan = update(make_pack, install)
+    assert read("config/conflict.cfg") == "mine=1"
+    assert read("config/conflict.cfg.new") == "pack=2"
+    assert read("config/added.cfg") == "mine=1"
+    assert read("config/added.cfg.new") == "pack=2"
+    assert not os.path.exists("config/same.cfg.new")
+
+    conflicts = ["config/conflict.cfg", "config/added.cfg"]
+    assert sorted(read(main.config_conflicts_file).split()) == sorted(conflicts)
+    assert sorted(plan["conflicts"]) == sorted(conflicts)
+
+
+def test_conflicts_of_the_previous_update_are_removed(instance, make_pack, install):
+    update(make_pack, install)
+    edit("config/conflict.cfg", "pack=2")
+    edit("config/added.cfg", "pack=2")
+
+    install(make_pack("v3.zip", PACK_V2))
+    assert not os.path.exists("config/conflict.cfg.new")
+    assert not os.path.exists("config/added.cfg.new")
+    assert not os.path.exists(main.config_conflicts_file)
+
+
+def test_kept_configs_stay_edited_on_the_next_update(instance, make_pack, install):
+    update(make_pack, install)
+    install(make_pack("v3.zip", dict(PACK_V2, **{"config/edited.cfg": "pack=3"})))
+    assert read("config/edited.cfg") == "mine=1"
+    assert read("config/edited.cfg.new") == "pack=3"
@@ -0,0 +1,97 @@
+import os
+import zlib
+
+import main
+from conftest import read
+
+PACK_V1 = {
+    "mods/a.jar": "a1",
+    "mods/b.jar": "b",
+    "config/a.cfg": "a1",
+    "scripts/s.zs": "s1",
+    "server.properties": "motd=v1",
+    "startserver.sh": "java",
+}
+PACK_V2 = dict(PACK_V1, **{"mods/a.jar": "a2", "server.properties": "motd=v2"})
+
+
+def test_delta_replaces_changed_files(instance, make_pack, install):
+    install(make_pack("v1.zip", PACK_V1))
+    install(make_pack("v2.zip", PACK_V2))
+
+    assert read("mods/a.jar") == "a2"
+    assert read("mods/b.jar") == "b"
+    assert main.load_manifest()["files"]["mods/a.jar"][:2] == [2, zlib.crc32(b"a2")]
+
+
+def test_delta_never_overwrites_files_outside_the_updated_folders(
+    instance, make_pack, install
+):
+    install(make_pack("v1.zip", PACK_V1))
+    with open("server.properties", "w") as f:
+        f.write("motd=mine")
+
+    install(make_pack("v2.zip", PACK_V2))
+    assert read("server.properties") == "motd=mine"
+
+
+def test_delta_never_deletes_files_outside_the_updated_folders(
+    instance, make_pack, install
+):
+    install(make_pack("v1.zip", PACK_V1))
+    pack = dict(PACK_V1)
+    del pack["startserver.sh"]
+    del pack["scripts/s.zs"]
+
+    install(make_pack("v2.zip", pack))
+    assert os.path.exists("startserver.sh")
+    assert not os.path.exists("scripts/s.zs")
+
+
+def test_delta_extracts_missing_unchanged_files(instance, make_pack, install):
+    install(make_pack("v1.zip", PACK_V1))
+    os.remove("mods/b.jar")
+    os.remove("startserver.sh")
+    zip_file = make_pack("v2.zip", PACK_V2)
+
+    plan = main.plan_update("server", ".", zip_file)
+    assert "mods/b.jar" in plan["extract"]
+    assert "startserver.sh" in plan["extract"]
+
+    install(zip_file)
+    assert read("mods/b.jar") == "b"
+    assert read("startserver.sh") == "java"
+
+
+def test_delta_removes_stray_files_in_the_updated_folders(instance, make_pack, install):
+    install(make_pack("v1.zip", PACK_V1))
+    with open("mods/extra.jar", "w") as f:
+        f.write("extra")
+
+    zip_file = make_pack("v2.zip", PACK_V2)
+    assert "mods/extra.jar" in main.plan_update("server", ".", zip_file)["delete"]
+
+    install(zip_file)
+    assert not os.path.exists("mods/extra.jar")
+
+
+def test_delta_replaces_files_in_the_way_of_added_members(instance, make_pack, install):
+    install(make_pack("v1.zip", PACK_V1))
+    with open("mods/c.jar", "w") as f:
+        f.write("old")
+
+    install(make_pack("v2.zip", dict(PACK_V2, **{"mods/c.jar": "c"})))
+    assert read("mods/c.jar") == "c"
+
+
+def test_plan_matches_the_delta(instance, make_pack, install):
+    install(make_pack("v1.zip", PACK_V1))
+    with open("server.properties", "w") as f:
+        f.write("motd=mine")
+    zip_file = make_pack("v2.zip", PACK_V2)
+
+    plan = main.plan_update("server", ".", zip_file)
+    assert plan["mode"] == "delta"
+    assert plan["delete"] == ["mods/a.jar"]
+    assert plan["extract"] == ["mods/a.jar"]
+    assert "server.properties" in plan["skip"]
@@ -0,0 +1,84 @@
+import os
+import urllib.error
+
+import pytest
+
+import main
+
+DATA = os.urandom(3 * 1024 * 1024 + 123)
+
+
+@pytest.fixture
+def download(http_server, tmp_path, monkeypatch):
+    """Download "/pack.zip" from the local server into "tmp_path", returns the file."""
+    monkeypatch.setattr(main, "download_chunk_size", 64 * 1024)
+    http_server.files["/pack.zip"] = DATA
+
+    def download(**kwargs):
+        dst = str(tmp_path / "pack.zip")
+        main.download_file(http_server.url + "/pack.zip", dst, quiet=True, **kwargs)
+        return dst
+
+    return download
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_download(download, http_server):
+    assert read_bytes(download()) == DATA
+    assert http_server.requests == [("/pack.zip", None)]
+
+
+def test_download_resumes_after_a_cut_connection(download, http_server):
+    http_server.cut_after = 1024 * 1024
+
+    assert read_bytes(download()) == DATA
+    assert http_server.requests == [
+        ("/pack.zip", None),
+        ("/pack.zip", "bytes=1048576-"),
+    ]
+
+
+def test_download_resumes_a_part_file(download, http_server, tmp_path):
+    with open(tmp_path / "pack.zip.part", "wb") as f:
+        f.write(DATA[:1000])
+
+    assert read_bytes(download()) == DATA
+    assert http_server.requests == [("/pack.zip", "bytes=1000-")]
+    assert not os.path.exists(tmp_path / "pack.zip.part")
+
+
+def test_download_keeps_a_complete_part_file_on_416(download, http_server, tmp_path):
+    with open(tmp_path / "pack.zip.part", "wb") as f:
+        f.write(DATA)
+
+    assert read_bytes(download()) == DATA
+    assert http_server.requests == [("/pack.zip", "bytes=%d-" % len(DATA))]
+
+
+def test_download_starts_over_if_ranges_are_ignored(download, http_server, tmp_path):
+    http_server.ranges = False
+    with open(tmp_path / "pack.zip.part", "wb") as f:
+        f.write(b"x" * 1000)
+
+    assert read_bytes(download()) == DATA
+    assert http_server.requests == [("/pack.zip", "bytes=1000-")]
+
+
+def test_download_checks_the_sha256(download, tmp_path):
+    with pytest.raises(ValueError):
+        download(sha256="0" * 64)
+    # The next download starts from scratch
+    assert not os.path.exists(tmp_path / "pack.zip.part")
+    assert not os.path.exists(tmp_path / "pack.zip")
+
+
+def test_download_does_not_retry_client_errors(http_server, tmp_path):
+    with pytest.raises(urllib.error.HTTPError):
+        main.download_file(
+            http_server.url + "/missing.zip", str(tmp_path / "missing.zip"), quiet=True
+        )
+    assert len(http_server.requests) == 1
@@ -0,0 +1,89 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+import main
+
+FILES = {
+    "mods/a.jar": os.urandom(200 * 1024),
+    "config/a.cfg": b"a" * 10000,
+    "scripts/s.zs": b"s",
+}
+
+
+def make_zip():
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("mods/", b"")
+        for member, content in FILES.items():
+            zf.writestr(member, content)
+    return data.getvalue()
+
+
+@pytest.fixture
+def pack(http_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "download_chunk_size", 16 * 1024)
+    http_server.files["/pack.zip"] = make_zip()
+    return http_server.url + "/pack.zip", str(tmp_path / "pack.zip")
+
+
+def test_pipeline_extracts_while_downloading(instance, pack, monkeypatch):
+    url, zip_file = pack
+    staging = str(instance / ".gtnh-updater" / "staging")
+
+    assert main.pipeline_download_zip(url, zip_file, staging)
+    assert os.path.isfile(zip_file)
+    assert not os.path.exists(zip_file + ".part")
+
+    # The staged files are moved into place
+    monkeypatch.setattr(main, "pipeline_staging_dir", staging)
+    main.extract_game_zip(zip_file)
+    for member, content in FILES.items():
+        with open(member, "rb") as f:
+            assert f.read() == content
+    assert not os.path.exists(staging)
+
+
+def test_pipeline_falls_back_to_resuming(instance, pack, http_server):
+    url, zip_file = pack
+    staging = str(instance / ".gtnh-updater" / "staging")
+    http_server.cut_after = 50 * 1024
+
+    assert not main.pipeline_download_zip(url, zip_file, staging)
+    assert not os.path.exists(staging)
+    assert os.path.getsize(zip_file + ".part") == 50 * 1024
+
+    main.download_file(url, zip_file, validate_zip=True, quiet=True)
+    assert http_server.requests[-1] == ("/pack.zip", "bytes=51200-")
+    with open(zip_file, "rb") as f:
+        assert f.read() == http_server.files["/pack.zip"]
+
+
+def test_pipeline_rejects_a_corrupt_stream(instance, pack, http_server):
+    url, zip_file = pack
+    staging = str(instance / ".gtnh-updater" / "staging")
+    data = bytearray(http_server.files["/pack.zip"])
+    # In the middle of the deflated data of the first member
+    data[1000] ^= 0xFF
+    http_server.files["/pack.zip"] = bytes(data)
+
+    # Extracted normally instead, which checks the CRC of every member again
+    assert not main.pipeline_download_zip(url, zip_file, staging)
+    assert not os.path.exists(staging)
+
+
+def test_no_pipeline_into_a_missing_game_directory(tmp_path, monkeypatch):
+    path_file = tmp_path / "gamepath.txt"
+    path_file.write_text("missing")
+    monkeypatch.chdir(tmp_path)
+
+    def find_zip_file(path):
+        raise AssertionError("the zip is looked for")
+
+    monkeypatch.setattr(main, "find_zip_file", find_zip_file)
+    with pytest.raises(SystemExit):
+        main.get_zip_file(str(path_file), str(tmp_path / "missing"))
+    assert not os.path.exists(tmp_path / "missing")
+    assert not os.path.exists(path_file)
@@ -0,0 +1,87 @@
+import json
+import os
+
+import pytest
+
+import main
+from conftest import read
+
+OLD = {
+    "server.properties": "motd=GT New Horizons\n",
+    "libraries/launchwrapper.jar": "launchwrapper",
+    "mods/gregtech.jar": "gregtech 1",
+    "config/gregtech.cfg": "B:debug=false\n",
+}
+NEW = dict(OLD, **{"mods/gregtech.jar": "gregtech 2"})
+
+
+def stage(instance, zip_file):
+    """Update the server in its staging folder, like update_server_staged does."""
+    staging = str(instance) + ".staging"
+    main.prepare_staging(str(instance), staging, zip_file)
+    os.chdir(staging)
+    main.install_game_zip(
+        zip_file,
+        main.protected_configs["server"],
+        main.update_folders["server"],
+        main.compile_profile("server"),
+    )
+    main.empty_trash()
+    return staging
+
+
+@pytest.fixture
+def staged(instance, make_pack, install):
+    install(make_pack("GT_New_Horizons_2.4.0_Server_Java_8.zip", OLD))
+    with open("server.properties", "w") as f:
+        f.write("motd=My server\n")
+    stage(instance, make_pack("GT_New_Horizons_2.5.0_Server_Java_8.zip", NEW))
+    return instance
+
+
+def test_swap_keeps_the_files_of_the_operator(staged):
+    main.swap_staged_update(str(staged))
+
+    os.chdir(staged)
+    assert read("server.properties") == "motd=My server\n"
+    assert read("mods/gregtech.jar") == "gregtech 2"
+    assert read("libraries/launchwrapper.jar") == "launchwrapper"
+    assert not os.path.exists(str(staged) + ".staging")
+
+    # Only what the update replaced was swapped
+    backup = str(staged) + ".previous"
+    assert read(os.path.join(backup, "mods/gregtech.jar")) == "gregtech 1"
+    assert not os.path.exists(os.path.join(backup, "libraries"))
+    assert not os.path.exists(os.path.join(backup, "server.properties"))
+
+
+def test_staging_leaves_the_live_records_alone(staged):
+    live = os.path.join(str(staged), main.manifest_file)
+    manifest = read(live)
+    main.save_installed_record(
+        os.path.join(str(staged) + ".staging", main.installed_file), "pack.zip", "n"
+    )
+
+    assert read(live) == manifest
+    assert not os.path.exists(os.path.join(str(staged), main.installed_file))
+
+    main.swap_staged_update(str(staged))
+    with open(os.path.join(str(staged), main.installed_file), "r") as f:
+        assert json.load(f)["zip"] == "pack.zip"
+
+
+def test_previous_is_kept_until_confirmed(staged, make_pack, capsys):
+    main.swap_staged_update(str(staged))
+    backup = str(staged) + ".previous"
+    assert os.path.isdir(backup)
+
+    stage(staged, make_pack("GT_New_Horizons_2.6.0_Server_Java_8.zip", OLD))
+    with pytest.raises(SystemExit):
+        main.swap_staged_update(str(staged))
+    assert "swap --confirm" in capsys.readouterr().out
+    assert read(os.path.join(str(staged), "mods/gregtech.jar")) == "gregtech 2"
+
+    main.confirm_swap(str(staged))
+    assert not os.path.exists(backup)
+    main.swap_staged_update(str(staged))
+    assert read(os.path.join(str(staged), "mods/gregtech.jar")) == "gregtech 1"
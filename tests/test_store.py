@@ -0,0 +1,129 @@
+import os
+import zlib
+
+import main
+
+
+def crc32_collision(data):
+    """Flip bits of "data" until it has the same CRC32 & size, but different bytes.
+
+    For a given size, the CRC32 is linear in the bits of the data, so 33 bits
+    always have a combination that doesn't change it.
+    """
+    zero = zlib.crc32(bytes(len(data)))
+    basis = {}
+    for bit in range(33):
+        flipped = bytearray(len(data))
+        flipped[bit // 8] |= 1 << (bit % 8)
+        vector = zlib.crc32(bytes(flipped)) ^ zero
+        bits = {bit}
+        while vector:
+            pivot = vector.bit_length() - 1
+            if pivot not in basis:
+                basis[pivot] = (vector, bits)
+                break
+            vector ^= basis[pivot][0]
+            bits = bits ^ basis[pivot][1]
+        else:
+            collision = bytearray(data)
+            for flip in bits:
+                collision[flip // 8] ^= 1 << (flip % 8)
+            return bytes(collision)
+
+
+JAR = b"jar of the first pack" * 10
+COLLISION = crc32_collision(JAR)
+
+
+def test_crc32_collision():
+    assert COLLISION != JAR
+    assert len(COLLISION) == len(JAR)
+    assert zlib.crc32(COLLISION) == zlib.crc32(JAR)
+
+
+def test_store_copy_doesnt_link_a_crc32_collision(instance):
+    for name, data in (("a.jar", JAR), ("b.jar", COLLISION)):
+        with open(name, "wb") as f:
+            f.write(data)
+    os.makedirs("mods")
+
+    main.store_copy("a.jar", "mods/a.jar")
+    main.store_copy("b.jar", "mods/b.jar")
+    with open("mods/b.jar", "rb") as f:
+        assert f.read() == COLLISION
+    assert not os.path.samefile("mods/a.jar", "mods/b.jar")
+
+
+def test_extraction_doesnt_link_a_crc32_collision(instance, make_pack, install):
+    with open("stored.jar", "wb") as f:
+        f.write(JAR)
+    os.makedirs("mods")
+    main.store_copy("stored.jar", "mods/stored.jar")
+
+    install(make_pack("v1.zip", {"mods/a.jar": COLLISION}))
+    with open("mods/a.jar", "rb") as f:
+        assert f.read() == COLLISION
+
+
+def test_extraction_links_known_members_without_inflating(
+    instance, tmp_path, make_pack, install, monkeypatch
+):
+    zip_file = make_pack("v1.zip", {"mods/a.jar": JAR, "config/a.cfg": "a"})
+    install(zip_file)
+    assert main.load_pack_index(zip_file)["hashes"] == {
+        "mods/a.jar": main.file_sha256("mods/a.jar")
+    }
+
+    def no_open(*args, **kwargs):
+        raise AssertionError("inflated")
+
+    other = tmp_path / "other"
+    (other / "mods").mkdir(parents=True)
+    os.chdir(other)
+    monkeypatch.setattr(main.zipfile.ZipFile, "open", no_open)
+    main.extract_members(
+        zip_file,
+        ["mods/a.jar"],
+        use_store=True,
+        hashes={"mods/a.jar": main.file_sha256(str(instance / "mods" / "a.jar"))},
+    )
+    assert os.path.samefile("mods/a.jar", instance / "mods" / "a.jar")
+
+
+def test_repair_replaces_a_corrupt_store_entry(instance, make_pack, install):
+    zip_file = make_pack("v1.zip", {"mods/a.jar": JAR})
+    install(zip_file)
+    (entry,) = main.find_store_entries(["mods/a.jar"])
+
+    # Written in place, so the store entry is corrupt as well
+    with open("mods/a.jar", "r+b") as f:
+        f.write(b"corrupt")
+    manifest, broken = main.verify_instance("server", ".")
+    assert broken == ["mods/a.jar"]
+
+    assert main.repair_instance(".", manifest, broken, zip_file) == []
+    with open("mods/a.jar", "rb") as f:
+        assert f.read() == JAR
+    with open(entry, "rb") as f:
+        assert f.read() == JAR
+
+
+def test_extraction_doesnt_link_a_store_entry_written_in_place(
+    instance, tmp_path, make_pack, install
+):
+    zip_file = make_pack("v1.zip", {"mods/a.jar": JAR})
+    install(zip_file)
+    (entry,) = main.find_store_entries(["mods/a.jar"])
+
+    # Same size, the known hash of the member no longer matches the entry
+    with open("mods/a.jar", "r+b") as f:
+        f.write(b"corrupt")
+
+    other = tmp_path / "other"
+    other.mkdir()
+    os.chdir(other)
+    main.install_game_zip(zip_file, [], main.update_folders["server"])
+    with open("mods/a.jar", "rb") as f:
+        assert f.read() == JAR
+    with open(entry, "rb") as f:
+        assert f.read() == JAR
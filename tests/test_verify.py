@@ -0,0 +1,53 @@
+import os
+
+import main
+from conftest import read
+
+PACK = {
+    "mods/a.jar": "a",
+    "config/a.cfg": "a",
+    "server.properties": "motd=pack",
+}
+
+
+def test_verify_finds_missing_and_corrupt_files(instance, make_pack, install):
+    install(make_pack("v1.zip", PACK))
+    os.remove("mods/a.jar")
+    with open("server.properties", "w") as f:
+        f.write("motd=broken")
+
+    manifest, broken = main.verify_instance("server", ".")
+    assert sorted(broken) == ["mods/a.jar", "server.properties"]
+
+
+def test_repair_extracts_broken_files_again(instance, make_pack, install):
+    zip_file = make_pack("v1.zip", PACK)
+    install(zip_file)
+    os.remove("mods/a.jar")
+
+    manifest, broken = main.verify_instance("server", ".")
+    assert main.repair_instance(".", manifest, broken, zip_file) == []
+    assert read("mods/a.jar") == "a"
+    assert main.verify_instance("server", ".")[1] == []
+
+
+def test_verify_ignores_files_that_existed_before_the_install(
+    instance, make_pack, install
+):
+    with open("server.properties", "w") as f:
+        f.write("motd=mine")
+
+    install(make_pack("v1.zip", PACK))
+    assert read("server.properties") == "motd=mine"
+    assert "server.properties" not in main.load_manifest()["files"]
+    assert main.verify_instance("server", ".")[1] == []
+
+
+def test_verify_ignores_files_a_delta_update_skipped(instance, make_pack, install):
+    install(make_pack("v1.zip", PACK))
+    with open("server.properties", "w") as f:
+        f.write("motd=mine")
+
+    install(make_pack("v2.zip", dict(PACK, **{"server.properties": "motd=v2"})))
+    assert read("server.properties") == "motd=mine"
+    assert main.verify_instance("server", ".")[1] == []